@@ -0,0 +1,135 @@
+import asyncio
+import inspect
+import threading
+import time
+from socket_handler import create_socket
+import event_log
+
+# ========== asyncio Receive Engine ==========
+# Alternative to main.receive_loop: one event loop owns the listening socket
+# and the periodic timers (PING, the file NACK sweep, token and decision
+# expiry, via schedule_every), so they don't each need a sleeping thread.
+# Enabled with settings["ASYNC_ENGINE"] or `--async`. Retransmits share one
+# sweeper thread for every outstanding message (reliability.py), and each
+# outgoing file keeps its sender thread, which blocks on disk and pacing.
+
+_loop = None
+_tasks = set()  # strong refs so running handler tasks aren't garbage collected
+_scheduled = set()  # names passed to schedule_every
+_scheduled_lock = threading.Lock()
+
+class LSNPProtocol(asyncio.DatagramProtocol):
+    def __init__(self, dispatch):
+        self.dispatch = dispatch
+        self.transport = None
+
+    def connection_made(self, transport):
+        self.transport = transport
+
+    def datagram_received(self, data, addr):
+        try:
+            result = self.dispatch(data, addr, self.transport)
+        except Exception as e:
+            event_log.debug("RECV_ERROR", error=e, src=addr[0])
+            return
+
+        # Async-aware handlers return a coroutine; run it on the loop
+        if inspect.isawaitable(result):
+            task = asyncio.ensure_future(result)
+            _tasks.add(task)
+            task.add_done_callback(_task_done)
+
+    def error_received(self, exc):
+        event_log.debug("RECV_ERROR", error=exc)
+
+def _task_done(task):
+    _tasks.discard(task)
+    if not task.cancelled() and task.exception():
+        event_log.debug("HANDLER_ERROR", error=task.exception())
+
+def is_running() -> bool:
+    return _loop is not None and _loop.is_running()
+
+def call_later(delay: float, callback, *args):
+    """
+    Schedules callback on the engine's event loop from any thread.
+    Returns False if the engine isn't running so callers can fall back.
+    """
+    if not is_running():
+        return False
+    _loop.call_soon_threadsafe(_loop.call_later, delay, callback, *args)
+    return True
+
+def call_every(interval: float, callback) -> bool:
+    """
+    Runs callback every interval seconds on the engine's event loop, from
+    any thread. Returns False if the engine isn't running so callers can
+    fall back to a timer thread.
+    """
+    def tick():
+        try:
+            callback()
+        except Exception as e:
+            event_log.debug("TIMER_ERROR", error=e)
+        finally:
+            _loop.call_later(interval, tick)
+    return call_later(interval, tick)
+
+def schedule_every(interval: float, callback, name: str):
+    """
+    Runs callback every interval seconds: on the engine's event loop if it
+    is running, else on a daemon thread called name. Each name is scheduled
+    once; later calls with the same name do nothing.
+    """
+    with _scheduled_lock:
+        if name in _scheduled:
+            return
+        _scheduled.add(name)
+    if not call_every(interval, callback):
+        threading.Thread(target=_every_loop, args=(interval, callback), name=name, daemon=True).start()
+
+def _every_loop(interval: float, callback):
+    while True:
+        time.sleep(interval)
+        try:
+            callback()
+        except Exception as e:
+            event_log.debug("TIMER_ERROR", error=e)
+
+def run_blocking(fn, *args):
+    """
+    Runs fn(*args), which may block on disk: in the loop's default executor
+    when called on the engine's event loop, so receipt isn't held up, else
+    right here (timer threads already run off the receive path).
+    """
+    try:
+        on_loop = asyncio.get_running_loop() is _loop
+    except RuntimeError:
+        on_loop = False
+    if not on_loop:
+        fn(*args)
+        return
+    future = _loop.run_in_executor(None, fn, *args)
+    future.add_done_callback(_blocking_done)
+
+def _blocking_done(future):
+    if not future.cancelled() and future.exception():
+        event_log.debug("TIMER_ERROR", error=future.exception())
+
+def run(dispatch, on_start=None):
+    """
+    Runs the event loop forever (meant for a daemon thread). on_start(loop)
+    runs on the loop once the socket is bound, to schedule startup timers.
+    """
+    global _loop
+    _loop = asyncio.new_event_loop()
+    asyncio.set_event_loop(_loop)
+
+    sock = create_socket()
+    sock.setblocking(False)
+    _loop.run_until_complete(
+        _loop.create_datagram_endpoint(lambda: LSNPProtocol(dispatch), sock=sock)
+    )
+    if on_start is not None:
+        _loop.call_soon(on_start, _loop)
+    _loop.run_forever()
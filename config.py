@@ -2,20 +2,95 @@
 PORT = 50999
 BROADCAST_ADDRESS = '192.168.208.255'
 BUFFER_SIZE = 65535
+RECV_BATCH = 32  # datagrams drained per receive_batch call
 MAX_IMAGE_SIZE = 8192
 ENCODING = 'utf-8'
 MESSAGE_TERMINATOR = '\n\n'
 SEPARATOR = ': '
 settings = {
     "VERBOSE": True,
+    "ASYNC_ENGINE": False,  # asyncio receive engine instead of the receive_loop thread
+    "RECV_WORKERS": 0,  # >1 shards unicast receive across SO_REUSEPORT worker processes
+    "LOG_FILE": None,  # verbose events go here as JSON lines instead of the terminal
 }
 
+MTU = 1500  # link MTU assumed when packing multi-item datagrams
+IP_UDP_HEADER = 28
+
 # Intervals
 PING_INTERVAL = 300
 PROFILE_INTERVAL = 300
 
+# Peer table
+PEER_EXPIRY_PINGS = 3  # missed PING intervals before a silent peer is dropped
+MAX_PEERS = 1000  # least recently seen peer is evicted beyond this
+
 TOKEN_EXPIRATION_SECONDS = 3600
-CHUNK_SIZE = 1024
+TOKEN_SWEEP_INTERVAL = 60  # seconds between purges of expired tokens and revocations
+MAX_TOKENS = 10000  # parsed tokens cached (see token_registry.py)
+MAX_REVOKED = 50000  # revoked token hashes remembered; the oldest go first beyond this
 
 # Default TTL
 DEFAULT_TTL = 3600
+MAX_POSTS = 10000  # soonest-to-expire post is dropped beyond this
+
+# Pending decisions (see decisions.py)
+DECISION_TIMEOUT = 300  # seconds an undecided file offer / game invite waits before it's declined
+MAX_PENDING_DECISIONS = 100  # oldest is declined beyond this
+AUTO_ACCEPT_PEERS = set()  # USER_IDs whose file offers and game invites are accepted without asking
+AUTO_REJECT_PEERS = set()  # USER_IDs whose file offers and game invites are declined without asking
+FILE_AUTO_ACCEPT_MAX = 0  # file offers up to this many bytes are accepted without asking (0 = off)
+FILE_AUTO_REJECT_OVER = 0  # file offers over this many bytes are declined without asking (0 = no limit)
+
+# Send socket pool
+HOT_PEER_THRESHOLD = 8  # datagrams to one peer before it gets a connect()ed socket
+MAX_CONNECTED_PEERS = 32
+
+# Duplicate suppression (see dedup.py)
+DEDUP_WINDOW = 600  # seconds a message ID is remembered
+DEDUP_CAPACITY = 100000  # IDs per half-window before an early rotation
+DEDUP_FP_RATE = 0.0001
+
+# Reliable delivery (see reliability.py)
+# Every unicast type that carries a MESSAGE_ID. The others with one, POST and
+# GROUP_CREATE, are broadcasts: send_udp has no single peer to wait on, so
+# they go out once. Types without a MESSAGE_ID have nothing to ACK: PROFILE,
+# PING, TOKEN and REVOKE(_BATCH) are broadcasts too, LIKE is fire-and-forget,
+# ACK is never ACKed, and file transfers recover through their own
+# FILE_CHUNK_ACK / FILE_NACK exchange (file_transfer/).
+RELIABLE_TYPES = {
+    "DM", "FOLLOW", "UNFOLLOW", "GROUP_UPDATE", "GROUP_MESSAGE",
+    "TICTACTOE_INVITE", "TICTACTOE_MOVE", "TICTACTOE_RESULT",
+}
+RTO_INITIAL = 1.0  # seconds, before any RTT sample
+RTO_MIN = 0.2
+RTO_MAX = 8.0
+MAX_RETRIES = 4
+
+# Event log (see event_log.py)
+LOG_RING_SIZE = 4096
+LOG_SAMPLE_RATES = {  # keep 1 in N of these high-rate events
+    "RECV FILE_CHUNK": 100,
+    "FILE_CHUNK_RECEIVED": 100,
+}
+
+# File transfer pacing (see file_transfer/congestion.py)
+FILE_INIT_WINDOW = 4  # chunks in flight before any feedback
+FILE_MAX_WINDOW = 512
+FILE_MAX_RATE = 12_500_000  # bytes/s ceiling per transfer (100 Mbit/s), 0 = none
+FILE_ACK_EVERY = 2  # receiver sends FILE_CHUNK_ACK after this many in-order chunks
+FILE_REORDER_THRESHOLD = 3  # later chunks delivered before one counts as lost
+FILE_MAX_RETRIES = 8  # sends of one chunk before the transfer is abandoned
+FILE_NACK_INTERVAL = 0.2  # seconds between receiver FILE_NACKs for open gaps
+FILE_STALL_TIMEOUT = 60  # seconds without any chunk before a transfer is abandoned
+FILE_MIN_CHUNK = 512  # chunk payload bounds; sizes come from the path MTU (see file_transfer/chunking.py)
+FILE_MAX_CHUNK = 16384  # caps chunks on loopback / jumbo-frame paths
+FILE_MAX_CHUNKS = 1 << 22  # TOTAL_CHUNKS accepted for an offer without a FILESIZE (a 512 KB bitmap)
+FILE_LOSS_SHRINK = 0.05  # a transfer losing more than this halves the peer's next chunk size
+FILE_LOSS_GROW = 0.01  # and one losing less doubles it back
+FILE_PROGRESS_INTERVAL = 1.0  # seconds between saves of a transfer's .part.progress bitmap (resume)
+FILE_PIPELINE_DEPTH = 32  # chunks read and encoded ahead of the sender (see file_transfer/pipeline.py)
+FILE_ENCODE_WORKERS = 2
+FILE_COMPRESSION_CODECS = ("zlib", "lzma")  # per-chunk codecs offered/accepted, preferred first; () = off
+FILE_COMPRESS_MIN_SAVING = 0.1  # files whose sample saves less than this are sent uncompressed
+FILE_BINARY_FRAMING = True  # offer/accept raw binary FILE_CHUNK frames (no base64), text otherwise
@@ -0,0 +1,145 @@
+import itertools
+import threading
+import time
+from collections import OrderedDict
+import async_engine
+from config import (
+    DECISION_TIMEOUT, MAX_PENDING_DECISIONS, AUTO_ACCEPT_PEERS, AUTO_REJECT_PEERS,
+    FILE_AUTO_ACCEPT_MAX, FILE_AUTO_REJECT_OVER,
+)
+
+# ========== Pending Decisions ==========
+# File offers and game invites need a yes/no from the user, but the receive
+# path must never wait on a human. Handlers submit() the question with what
+# to do either way and return at once. Config policies (peer allow/deny
+# lists, file size limits) answer straight away where they can; the rest
+# wait for `accept <n>` / `reject <n>` at the CLI, which runs the chosen
+# callback on the CLI thread. A question nobody answers within
+# DECISION_TIMEOUT is declined by a timer that checks every SWEEP_INTERVAL
+# once anything has been queued (async_engine.schedule_every).
+
+class Decision:
+    __slots__ = ("id", "kind", "key", "peer", "summary", "on_accept", "on_reject", "created")
+
+    def __init__(self, id, kind, key, peer, summary, on_accept, on_reject):
+        self.id = id
+        self.kind = kind
+        self.key = key
+        self.peer = peer
+        self.summary = summary
+        self.on_accept = on_accept
+        self.on_reject = on_reject
+        self.created = time.monotonic()
+
+_pending = OrderedDict()  # id → Decision, oldest first
+_ids = itertools.count(1)
+_lock = threading.Lock()
+SWEEP_INTERVAL = 5.0
+
+def policy(kind: str, peer: str, size: int = None):
+    """True / False if config decides this without asking, else None."""
+    if peer in AUTO_REJECT_PEERS:
+        return False
+    if kind == "file" and size is not None and FILE_AUTO_REJECT_OVER and size > FILE_AUTO_REJECT_OVER:
+        return False
+    if peer in AUTO_ACCEPT_PEERS:
+        return True
+    if kind == "file" and size is not None and FILE_AUTO_ACCEPT_MAX and size <= FILE_AUTO_ACCEPT_MAX:
+        return True
+    return None
+
+def submit(kind: str, key, peer: str, summary: str, on_accept, on_reject, size: int = None):
+    """
+    Queues a decision (key identifies it, e.g. the FILEID, so a repeated
+    offer isn't asked twice). Returns its id, or None if a policy decided it
+    on the spot (the callback has run) or it's already queued.
+    """
+    auto = policy(kind, peer, size)
+    if auto is not None:
+        print(f"{'✅' if auto else '⏳'} {summary}: {'accepted' if auto else 'declined'} by policy.")
+        (on_accept if auto else on_reject)()
+        return None
+
+    with _lock:
+        expired = _expire(time.monotonic())
+        if any(d.kind == kind and d.key == key for d in _pending.values()):
+            decision_id = None
+        else:
+            decision = Decision(next(_ids), kind, key, peer, summary, on_accept, on_reject)
+            _pending[decision.id] = decision
+            decision_id = decision.id
+            while len(_pending) > MAX_PENDING_DECISIONS:
+                expired.append(_pending.popitem(last=False)[1])
+    _decline(expired)
+    if decision_id is not None:
+        async_engine.schedule_every(SWEEP_INTERVAL, expire, "decision-sweeper")
+    return decision_id
+
+def expire():
+    """Declines every decision older than DECISION_TIMEOUT."""
+    with _lock:
+        expired = _expire(time.monotonic())
+    _decline(expired)
+
+def _expire(now: float) -> list:
+    expired = []
+    while _pending:
+        decision = next(iter(_pending.values()))
+        if now - decision.created < DECISION_TIMEOUT:
+            break
+        expired.append(_pending.popitem(last=False)[1])
+    return expired
+
+def _decline(decisions):
+    for decision in decisions:
+        print(f"⏳ {decision.summary}: no answer, declined.")
+        try:
+            decision.on_reject()
+        except Exception as e:
+            print(f"❌ Error: {e}")
+
+def pending() -> list:
+    """Undecided decisions, oldest first."""
+    with _lock:
+        expired = _expire(time.monotonic())
+        waiting = list(_pending.values())
+    _decline(expired)
+    return waiting
+
+def resolve(decision_id: int, accept: bool) -> bool:
+    """Runs the decision's accept or reject callback. False if there is no such decision."""
+    with _lock:
+        decision = _pending.pop(decision_id, None)
+    if decision is None:
+        return False
+    (decision.on_accept if accept else decision.on_reject)()
+    return True
+
+# ========== CLI ==========
+def cli_pending():
+    waiting = pending()
+    if not waiting:
+        print("📭 Nothing waiting for a decision.")
+        return
+    now = time.monotonic()
+    for decision in waiting:
+        print(f"  [{decision.id}] {decision.summary} ({int(now - decision.created)}s ago)")
+    print("Use 'accept <n>' or 'reject <n>'.")
+
+def cli_resolve(arg: str, accept: bool):
+    """accept / reject <n>; with no n, the only pending decision."""
+    arg = arg.strip()
+    if not arg:
+        waiting = pending()
+        if len(waiting) != 1:
+            print("❓ Which one? See 'pending'." if waiting else "📭 Nothing waiting for a decision.")
+            return
+        decision_id = waiting[0].id
+    else:
+        try:
+            decision_id = int(arg)
+        except ValueError:
+            print("❓ Usage: accept <n> / reject <n>")
+            return
+    if not resolve(decision_id, accept):
+        print(f"❓ No pending decision {decision_id}.")
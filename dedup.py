@@ -0,0 +1,133 @@
+import math
+import hashlib
+import threading
+import time
+from config import DEDUP_WINDOW, DEDUP_CAPACITY, DEDUP_FP_RATE
+
+# ========== Duplicate Suppression ==========
+
+def message_key(msg, addr=None):
+    """
+    Identity of a message for duplicate suppression, or None if it carries no
+    ID. Understands MESSAGE_ID and the legacy ID field. The TYPE and sender IP
+    are part of the key so that an ACK (which echoes the original MESSAGE_ID)
+    never collides with the message it acknowledges. FILE_CHUNKs get no key:
+    the receiver's chunk bitmap already spots repeats exactly, and a Bloom
+    false positive on a chunk would drop it on every retransmit.
+    """
+    msg_type = msg.get("TYPE", "")
+    if msg_type == "FILE_CHUNK":
+        return None
+    msg_id = msg.get("MESSAGE_ID") or msg.get("ID")
+    if not msg_id:
+        return None
+    sender = addr[0] if addr else ""
+    return f"{sender}|{msg_type}|{msg_id}"
+
+class Deduplicator:
+    """
+    Fixed-memory duplicate filter over a sliding time window.
+
+    Two generations of Bloom filters: keys are added to the current one and
+    looked up in both. Every window/2 seconds (or earlier, once the current
+    generation holds `capacity` keys) the current generation becomes the
+    previous one and the old previous one is cleared, so a key is remembered
+    for between window/2 and window seconds and memory never grows.
+    """
+
+    def __init__(self, window: float = DEDUP_WINDOW, capacity: int = DEDUP_CAPACITY,
+                 fp_rate: float = DEDUP_FP_RATE):
+        self.window = window
+        self.capacity = capacity
+        self.num_bits = max(64, int(-capacity * math.log(fp_rate) / (math.log(2) ** 2)))
+        self.num_hashes = max(1, round(self.num_bits / capacity * math.log(2)))
+        self._current = bytearray((self.num_bits + 7) // 8)
+        self._previous = bytearray(len(self._current))
+        self._current_bits = 0   # set bits, for the false-positive estimate
+        self._previous_bits = 0
+        self._current_keys = 0
+        self._rotated_at = time.monotonic()
+        self._lock = threading.Lock()
+
+        self.checked = 0
+        self.suppressed = 0
+        self.rotations = 0
+        self.early_rotations = 0
+
+    def _positions(self, key: str):
+        digest = hashlib.blake2b(key.encode('utf-8'), digest_size=16).digest()
+        h1 = int.from_bytes(digest[:8], "little")
+        h2 = int.from_bytes(digest[8:], "little") | 1
+        m = self.num_bits
+        return [(h1 + i * h2) % m for i in range(self.num_hashes)]
+
+    @staticmethod
+    def _test(bits: bytearray, positions) -> bool:
+        for pos in positions:
+            if not bits[pos >> 3] & (1 << (pos & 7)):
+                return False
+        return True
+
+    def _rotate_if_due(self):
+        now = time.monotonic()
+        full = self._current_keys >= self.capacity
+        if not full and now - self._rotated_at < self.window / 2:
+            return
+        if full:
+            self.early_rotations += 1
+        self.rotations += 1
+        self._previous, self._current = self._current, self._previous
+        self._current[:] = bytes(len(self._current))
+        self._previous_bits, self._current_bits = self._current_bits, 0
+        self._current_keys = 0
+        self._rotated_at = now
+
+    def _insert(self, positions):
+        bits = self._current
+        for pos in positions:
+            byte, mask = pos >> 3, 1 << (pos & 7)
+            if not bits[byte] & mask:
+                bits[byte] |= mask
+                self._current_bits += 1
+        self._current_keys += 1
+
+    def check_and_add(self, key: str) -> bool:
+        """Returns True if key was (probably) seen in the window; records it otherwise."""
+        positions = self._positions(key)
+        with self._lock:
+            self._rotate_if_due()
+            self.checked += 1
+            if self._test(self._current, positions) or self._test(self._previous, positions):
+                self.suppressed += 1
+                return True
+            self._insert(positions)
+            return False
+
+    def __contains__(self, key: str) -> bool:
+        positions = self._positions(key)
+        with self._lock:
+            self._rotate_if_due()
+            return self._test(self._current, positions) or self._test(self._previous, positions)
+
+    def add(self, key: str):
+        positions = self._positions(key)
+        with self._lock:
+            self._rotate_if_due()
+            self._insert(positions)
+
+    def false_positive_rate(self) -> float:
+        """Estimated chance that a new key is wrongly reported as seen."""
+        k = self.num_hashes
+        p_current = (self._current_bits / self.num_bits) ** k
+        p_previous = (self._previous_bits / self.num_bits) ** k
+        return 1 - (1 - p_current) * (1 - p_previous)
+
+    def stats(self) -> dict:
+        return {
+            "CHECKED": self.checked,
+            "SUPPRESSED": self.suppressed,
+            "ROTATIONS": self.rotations,
+            "EARLY_ROTATIONS": self.early_rotations,
+            "EST_FALSE_POSITIVE_RATE": self.false_positive_rate(),
+            "MEMORY_BYTES": 2 * len(self._current),
+        }
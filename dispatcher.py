@@ -0,0 +1,101 @@
+import time
+
+# ========== Handler Registry ==========
+# Routes a message TYPE to its handler with one dict lookup. Exact types are
+# registered directly; prefix families (GROUP_*, GAME_*) are matched once per
+# distinct TYPE and the answer is cached, so later lookups are a dict hit too.
+# Handlers are called as handler(msg, addr).
+
+MAX_CACHED_MISSES = 256  # unknown TYPEs come off the wire, so bound the cache
+
+class Route:
+    """A registered handler plus its call and latency counters."""
+    __slots__ = ("name", "handler", "calls", "errors", "total_time", "max_time")
+
+    def __init__(self, name: str, handler):
+        self.name = name
+        self.handler = handler
+        self.calls = 0
+        self.errors = 0
+        self.total_time = 0.0
+        self.max_time = 0.0
+
+    def __call__(self, msg, addr):
+        start = time.perf_counter()
+        try:
+            return self.handler(msg, addr)
+        except Exception:
+            self.errors += 1
+            raise
+        finally:
+            elapsed = time.perf_counter() - start
+            self.calls += 1
+            self.total_time += elapsed
+            if elapsed > self.max_time:
+                self.max_time = elapsed
+
+_exact = {}     # TYPE → Route
+_prefixes = []  # [(PREFIX, Route)], longest prefix first
+_resolved = {}  # TYPE → Route or None, the one-hit lookup table
+_misses = 0
+
+def register(msg_type: str, handler, prefix: bool = False):
+    """
+    Registers handler for msg_type, or for every TYPE starting with msg_type
+    when prefix is True. Registering again replaces the previous handler.
+    """
+    msg_type = msg_type.upper()
+    if prefix:
+        route = Route(msg_type + "*", handler)
+        _prefixes[:] = [(p, r) for p, r in _prefixes if p != msg_type]
+        _prefixes.append((msg_type, route))
+        _prefixes.sort(key=lambda item: len(item[0]), reverse=True)
+    else:
+        route = Route(msg_type, handler)
+        _exact[msg_type] = route
+
+    # Anything resolved earlier may now resolve differently
+    global _misses
+    _resolved.clear()
+    _misses = 0
+    return route
+
+def resolve(msg_type: str):
+    """Returns the Route for msg_type, or None if nothing handles it."""
+    try:
+        return _resolved[msg_type]
+    except KeyError:
+        pass
+
+    route = _exact.get(msg_type)
+    if route is None:
+        for prefix, candidate in _prefixes:
+            if msg_type.startswith(prefix):
+                route = candidate
+                break
+
+    global _misses
+    if route is not None:
+        _resolved[msg_type] = route
+    elif _misses < MAX_CACHED_MISSES:
+        _misses += 1
+        _resolved[msg_type] = None
+    return route
+
+def route_stats() -> list:
+    """Per-route counters, busiest first."""
+    routes = list(_exact.values()) + [route for _, route in _prefixes]
+    return sorted(
+        (
+            {
+                "ROUTE": route.name,
+                "CALLS": route.calls,
+                "ERRORS": route.errors,
+                "AVG_MS": (route.total_time / route.calls * 1000) if route.calls else 0.0,
+                "MAX_MS": route.max_time * 1000,
+            }
+            for route in routes
+        ),
+        key=lambda row: row["CALLS"],
+        reverse=True,
+    )
@@ -0,0 +1,132 @@
+import json
+import sys
+import threading
+import time
+from collections import deque
+from config import settings, LOG_RING_SIZE, LOG_SAMPLE_RATES
+
+# ========== Structured Event Log ==========
+# Hot paths append (time, level, event, fields) tuples to a bounded ring and
+# return immediately; a background writer renders them to the terminal or,
+# when settings["LOG_FILE"] is set, as JSON lines. deque.append/popleft are
+# atomic, so producers never take a lock. When the ring is full the oldest
+# event is overwritten and counted in `dropped`.
+
+DEBUG = 10
+INFO = 20
+WARN = 30
+ERROR = 40
+LEVEL_NAMES = {DEBUG: "DEBUG", INFO: "INFO", WARN: "WARN", ERROR: "ERROR"}
+
+_ring = deque(maxlen=LOG_RING_SIZE)
+_wake = threading.Event()
+_writer = None
+_sample_counts = {}
+_min_level = DEBUG if settings["VERBOSE"] else INFO
+
+dropped = 0
+written = 0
+
+def set_verbose(on: bool):
+    """VERBOSE shows DEBUG events; otherwise only INFO and above."""
+    global _min_level
+    _min_level = DEBUG if on else INFO
+
+def enabled(level: int) -> bool:
+    return level >= _min_level
+
+def sampled(level: int, event: str) -> bool:
+    """
+    Level gate plus sampling: True if an event should be recorded now.
+    High-rate events in LOG_SAMPLE_RATES are kept 1 in N. Check this before
+    building expensive fields, then call record().
+    """
+    if level < _min_level:
+        return False
+    rate = LOG_SAMPLE_RATES.get(event)
+    if rate:
+        count = _sample_counts.get(event, 0)
+        _sample_counts[event] = count + 1
+        if count % rate:
+            return False
+    return True
+
+def record(level: int, event: str, **fields):
+    """Queues an event without gating (caller already checked sampled())."""
+    global dropped
+    if len(_ring) == _ring.maxlen:
+        dropped += 1
+    _ring.append((time.time(), level, event, fields))
+    if _writer is None:
+        _start_writer()
+    _wake.set()
+
+def log(level: int, event: str, **fields):
+    if sampled(level, event):
+        record(level, event, **fields)
+
+def debug(event: str, **fields):
+    log(DEBUG, event, **fields)
+
+def info(event: str, **fields):
+    log(INFO, event, **fields)
+
+def warn(event: str, **fields):
+    log(WARN, event, **fields)
+
+def error(event: str, **fields):
+    log(ERROR, event, **fields)
+
+# ========== Writer ==========
+def _render_text(ts, level, event, fields) -> str:
+    parts = " ".join(f"{k}={v}" for k, v in fields.items())
+    return f"[{int(ts)}] {LEVEL_NAMES.get(level, level)} {event} {parts}".rstrip()
+
+def _render_json(ts, level, event, fields) -> str:
+    return json.dumps({"ts": ts, "level": LEVEL_NAMES.get(level, level), "event": event, **fields},
+                      default=str, ensure_ascii=False)
+
+def _writer_loop():
+    global written
+    while True:
+        _wake.wait(0.5)
+        _wake.clear()
+        path = settings.get("LOG_FILE")
+        lines = []
+        while True:
+            try:
+                item = _ring.popleft()
+            except IndexError:
+                break
+            lines.append(_render_json(*item) if path else _render_text(*item))
+        if not lines:
+            continue
+        try:
+            if path:
+                with open(path, "a", encoding="utf-8") as f:
+                    f.write("\n".join(lines) + "\n")
+            else:
+                sys.stdout.write("\n".join(lines) + "\n")
+                sys.stdout.flush()
+            written += len(lines)
+        except OSError:
+            pass
+
+_writer_lock = threading.Lock()
+
+def _start_writer():
+    global _writer
+    with _writer_lock:
+        if _writer is None:
+            _writer = threading.Thread(target=_writer_loop, daemon=True)
+            _writer.start()
+
+def flush(timeout: float = 1.0):
+    """Waits (briefly) for the writer to drain the ring, e.g. before exit."""
+    deadline = time.monotonic() + timeout
+    while _ring and time.monotonic() < deadline:
+        _wake.set()
+        time.sleep(0.01)
+
+def stats() -> dict:
+    return {"QUEUED": len(_ring), "WRITTEN": written, "DROPPED": dropped}
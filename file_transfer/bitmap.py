@@ -0,0 +1,61 @@
+class ChunkBitmap:
+    """
+    One bit per chunk of a transfer (a 2 GB file in 1 KB chunks is 256 KB of
+    bitmap), with a running count so completion checks are O(1).
+    """
+
+    __slots__ = ("total", "bits", "count")
+
+    def __init__(self, total: int, bits: bytes = None):
+        self.total = total
+        self.bits = bytearray(bits) if bits is not None else bytearray((total + 7) // 8)
+        self.count = sum(bin(b).count("1") for b in self.bits) if bits is not None else 0
+
+    def __contains__(self, index: int) -> bool:
+        return bool(self.bits[index >> 3] & (1 << (index & 7)))
+
+    def add(self, index: int) -> bool:
+        """Sets the bit for index. Returns False if it was already set."""
+        byte, mask = index >> 3, 1 << (index & 7)
+        if self.bits[byte] & mask:
+            return False
+        self.bits[byte] |= mask
+        self.count += 1
+        return True
+
+    def complete(self) -> bool:
+        return self.count >= self.total
+
+    def missing(self, start: int = 0, end: int = None, limit: int = None) -> list:
+        """Indices in [start, end) whose bit is clear (at most limit), skipping full bytes."""
+        end = self.total if end is None else min(end, self.total)
+        bits = self.bits
+        out = []
+        i = start
+        while i < end and (limit is None or len(out) < limit):
+            if not i & 7 and bits[i >> 3] == 0xFF:
+                i += 8
+                continue
+            if not bits[i >> 3] & (1 << (i & 7)):
+                out.append(i)
+            i += 1
+        return out
+
+    def present(self):
+        """Yields the indices whose bit is set, in order, skipping empty bytes."""
+        bits = self.bits
+        for byte, value in enumerate(bits):
+            if not value:
+                continue
+            base = byte << 3
+            for bit in range(8):
+                if value & (1 << bit) and base + bit < self.total:
+                    yield base + bit
+
+    def highest(self) -> int:
+        """Highest index whose bit is set, or -1."""
+        bits = self.bits
+        for byte in range(len(bits) - 1, -1, -1):
+            if bits[byte]:
+                return (byte << 3) + bits[byte].bit_length() - 1
+        return -1
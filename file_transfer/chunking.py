@@ -0,0 +1,71 @@
+import socket
+import sys
+import threading
+from config import (
+    PORT, MTU, IP_UDP_HEADER, FILE_MIN_CHUNK, FILE_MAX_CHUNK, FILE_LOSS_SHRINK, FILE_LOSS_GROW,
+)
+
+# ========== Chunk Sizing ==========
+# The one place FILE_CHUNK payload sizes come from. A chunk is sized so its
+# whole datagram fits the path MTU to the peer (no IP fragmentation, where one
+# lost fragment loses the chunk), read from the kernel with IP_MTU on Linux
+# and falling back to config.MTU elsewhere. Text chunks pay for base64 and
+# the header lines, binary frames (framing.py) only for their fixed header.
+#
+# Chunk size is fixed for one transfer (the receiver writes at index * size),
+# so loss is fed back per peer: a transfer that lost more than
+# FILE_LOSS_SHRINK of its sends halves the next transfer's chunks to that
+# peer, down to FILE_MIN_CHUNK; one under FILE_LOSS_GROW doubles them again.
+#
+# Compressed transfers (compression.py) use the same sizes: any chunk may
+# not compress and go out raw, so chunks aren't scaled up by the expected
+# ratio, and compression only makes datagrams smaller.
+
+# Linux values; the socket module doesn't export these names
+IP_MTU_DISCOVER = getattr(socket, "IP_MTU_DISCOVER", 10)
+IP_PMTUDISC_DO = getattr(socket, "IP_PMTUDISC_DO", 2)
+IP_MTU = getattr(socket, "IP_MTU", 14)
+
+_shrink = {}  # peer IP → times the chunk size was halved for loss
+MAX_SHRINK = 5
+_lock = threading.Lock()
+
+def path_mtu(peer_ip: str) -> int:
+    """The kernel's path MTU to peer_ip, or config.MTU if it can't be read."""
+    if not sys.platform.startswith("linux"):
+        return MTU
+    try:
+        with socket.socket(socket.AF_INET, socket.SOCK_DGRAM) as s:
+            s.setsockopt(socket.IPPROTO_IP, IP_MTU_DISCOVER, IP_PMTUDISC_DO)
+            s.connect((peer_ip, PORT))  # routes only, nothing is sent
+            return s.getsockopt(socket.IPPROTO_IP, IP_MTU)
+    except OSError:
+        return MTU
+
+def chunk_size(peer_ip: str, overhead: int, base64: bool = False) -> int:
+    """
+    Payload bytes per chunk to peer_ip when each datagram also carries
+    overhead bytes of header (and, if base64, the payload is encoded).
+    """
+    room = path_mtu(peer_ip) - IP_UDP_HEADER - overhead
+    if base64:
+        room = room // 4 * 3
+    with _lock:
+        room >>= _shrink.get(peer_ip, 0)
+    return max(FILE_MIN_CHUNK, min(room, FILE_MAX_CHUNK))
+
+def record_loss(peer_ip: str, sent: int, losses: int):
+    """Adjusts the peer's chunk size from one finished transfer's loss rate."""
+    if not sent:
+        return
+    rate = losses / sent
+    with _lock:
+        shift = _shrink.get(peer_ip, 0)
+        if rate > FILE_LOSS_SHRINK and shift < MAX_SHRINK:
+            shift += 1
+        elif rate < FILE_LOSS_GROW and shift:
+            shift -= 1
+        if shift:
+            _shrink[peer_ip] = shift
+        else:
+            _shrink.pop(peer_ip, None)
@@ -0,0 +1,92 @@
+import lzma
+import mimetypes
+import os
+import zlib
+from config import FILE_COMPRESSION_CODECS, FILE_COMPRESS_MIN_SAVING
+
+# ========== Chunk Compression ==========
+# Negotiated per transfer: FILE_OFFER lists the codecs the sender will use
+# (COMPRESSION: zlib,lzma), FILE_ACCEPT names the one picked (or "none").
+# Every chunk is compressed on its own, so any chunk can still be written at
+# its offset or resent alone, and a chunk that doesn't shrink goes out raw
+# (chunks are sized for raw data, so it still fits one datagram); a per-chunk
+# flag says which (COMPRESSED: 1 in text chunks, FLAG_COMPRESSED in binary
+# frames).
+#
+# Files that are already compressed (archives, media, by extension or MIME
+# type) are never offered compressed, and other files only if a quick zlib
+# sample of a few blocks saves at least FILE_COMPRESS_MIN_SAVING.
+
+ZLIB_LEVEL = 6
+LZMA_FILTERS = [{"id": lzma.FILTER_LZMA2, "preset": 1}]  # raw stream: no container header per chunk
+
+COMPRESSORS = {
+    "zlib": lambda data: zlib.compress(data, ZLIB_LEVEL),
+    "lzma": lambda data: lzma.compress(data, format=lzma.FORMAT_RAW, filters=LZMA_FILTERS),
+}
+
+COMPRESSED_EXTENSIONS = {
+    ".zip", ".gz", ".tgz", ".bz2", ".xz", ".lzma", ".7z", ".rar", ".zst", ".br",
+    ".jar", ".apk", ".docx", ".xlsx", ".pptx", ".odt", ".epub", ".pdf", ".woff2",
+}
+COMPRESSED_MIME_PREFIXES = ("image/", "audio/", "video/")
+
+SAMPLE_BLOCKS = 8
+SAMPLE_BLOCK_SIZE = 4096
+
+def is_precompressed(path: str, filetype: str = None) -> bool:
+    """Archives and media, which won't shrink any further."""
+    if os.path.splitext(path)[1].lower() in COMPRESSED_EXTENSIONS:
+        return True
+    filetype = filetype or mimetypes.guess_type(path)[0] or ""
+    return filetype.startswith(COMPRESSED_MIME_PREFIXES) and not filetype.endswith("+xml")
+
+def sample_ratio(path: str) -> float:
+    """Compressed / raw size of a few blocks spread through the file (zlib level 1)."""
+    filesize = os.path.getsize(path)
+    raw = packed = 0
+    with open(path, "rb") as f:
+        for i in range(SAMPLE_BLOCKS):
+            f.seek(max(0, filesize - SAMPLE_BLOCK_SIZE) * i // (SAMPLE_BLOCKS - 1))
+            block = f.read(SAMPLE_BLOCK_SIZE)
+            raw += len(block)
+            packed += len(zlib.compress(block, 1))
+    return packed / raw if raw else 1.0
+
+def choose_codecs(path: str, filetype: str = None) -> tuple:
+    """Codecs to offer, or () if the file isn't worth compressing."""
+    codecs = tuple(c for c in FILE_COMPRESSION_CODECS if c in COMPRESSORS)
+    if not codecs or is_precompressed(path, filetype):
+        return ()
+    if sample_ratio(path) > 1 - FILE_COMPRESS_MIN_SAVING:
+        return ()
+    return codecs
+
+def pick_codec(offered) -> str:
+    """Receiver side: the first offered codec we support, or None."""
+    for codec in offered:
+        if codec in FILE_COMPRESSION_CODECS and codec in COMPRESSORS:
+            return codec
+    return None
+
+def compress(codec: str, data) -> bytes:
+    return COMPRESSORS[codec](data)
+
+def decompress(codec: str, data, limit: int) -> bytes:
+    """Inflates one chunk; ValueError if it's corrupt or would exceed limit bytes."""
+    try:
+        if codec == "zlib":
+            d = zlib.decompressobj()
+            out = d.decompress(data, limit)
+            complete = d.eof and not d.unconsumed_tail
+        elif codec == "lzma":
+            d = lzma.LZMADecompressor(format=lzma.FORMAT_RAW, filters=LZMA_FILTERS)
+            out = d.decompress(data, max_length=limit)
+            complete = d.eof
+        else:
+            raise ValueError(f"unknown codec {codec!r}")
+    except (zlib.error, lzma.LZMAError) as e:
+        raise ValueError(str(e))
+    if not complete:
+        raise ValueError("chunk larger than expected")
+    return out
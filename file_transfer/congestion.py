@@ -0,0 +1,181 @@
+import threading
+from collections import deque
+from reliability import RttEstimator
+from config import (
+    FILE_INIT_WINDOW, FILE_MAX_WINDOW, FILE_MAX_RATE, FILE_REORDER_THRESHOLD, RTO_MAX,
+)
+
+# ========== Congestion Control ==========
+# Window-based pacing for FILE_CHUNK streams, driven by the receiver's
+# FILE_CHUNK_ACK feedback (cumulative NEXT_EXPECTED plus the ranges received
+# above it). AIMD: the window grows by one chunk per ACKed chunk in slow start
+# and by one chunk per window afterwards; a loss halves it, at most once per
+# round trip. Chunks are spaced out at window/RTT instead of sent in bursts,
+# never faster than FILE_MAX_RATE.
+#
+# Chunks reported missing (FILE_NACK, see receiver.py) go to the same lost
+# queue; the sender rebuilds them from the file, so no datagrams are kept.
+#
+# The sending thread and the receive thread (delivering ACKs) share one
+# controller; both hold `cond` while touching it.
+
+class WindowController:
+    def __init__(self, total_chunks: int, chunk_bytes: int, max_rate: int = FILE_MAX_RATE,
+                 init_window: int = FILE_INIT_WINDOW, max_window: int = FILE_MAX_WINDOW):
+        self.total_chunks = total_chunks
+        self.chunk_bytes = chunk_bytes
+        self.max_rate = max_rate
+        self.max_window = max_window
+        self.cwnd = float(init_window)
+        self.ssthresh = float(max_window)
+        self.rtt = RttEstimator()
+        self.cond = threading.Condition()
+
+        self.in_flight = {}   # chunk index → (send seq, sent at, retransmitted)
+        self.lost = deque()   # chunk indices waiting to be resent
+        self.delivered = bytearray(total_chunks)  # 1 per chunk the receiver has
+        self.delivered_count = 0
+        self._cumulative = 0  # every chunk below this is delivered
+        self._seq = 0         # increases with every datagram sent
+        self._acked_seq = -1  # highest send seq known delivered
+        self._recovery_until = 0.0
+
+        self.sent = 0
+        self.retransmits = 0
+        self.losses = 0
+
+    # ===== sender side =====
+    def complete(self) -> bool:
+        return self.delivered_count >= self.total_chunks
+
+    def can_send(self) -> bool:
+        return len(self.in_flight) < int(self.cwnd)
+
+    def next_lost(self):
+        """Next chunk to retransmit, skipping any delivered in the meantime."""
+        while self.lost:
+            index = self.lost.popleft()
+            if not self.delivered[index] and index not in self.in_flight:
+                return index
+        return None
+
+    def on_sent(self, index: int, now: float, retransmit: bool = False):
+        self.in_flight[index] = (self._seq, now, retransmit)
+        self._seq += 1
+        self.sent += 1
+        if retransmit:
+            self.retransmits += 1
+
+    def pacing_interval(self) -> float:
+        """Seconds to wait between chunk sends at the current window and RTT."""
+        srtt = self.rtt.srtt or self.rtt.rto
+        rate = self.cwnd * self.chunk_bytes / max(srtt, 1e-4)
+        if self.max_rate:
+            rate = min(rate, self.max_rate)
+        return self.chunk_bytes / rate
+
+    def next_timeout(self, now: float):
+        """Seconds until the oldest in-flight chunk times out, or None."""
+        if not self.in_flight:
+            return None
+        oldest = min(sent_at for _, sent_at, _ in self.in_flight.values())
+        return max(0.0, oldest + self.rtt.rto - now)
+
+    def check_timeouts(self, now: float) -> int:
+        """Moves in-flight chunks older than the RTO to the lost queue."""
+        rto = self.rtt.rto
+        timed_out = [i for i, (_, sent_at, _) in self.in_flight.items() if now - sent_at >= rto]
+        if timed_out:
+            self.rtt.rto = min(rto * 2, RTO_MAX)
+            self._mark_lost(timed_out, now)
+        return len(timed_out)
+
+    def mark_delivered(self, indices) -> int:
+        """Chunks the receiver already had before this transfer began (a resume)."""
+        count = 0
+        for index in indices:
+            if 0 <= index < self.total_chunks and not self.delivered[index]:
+                self.delivered[index] = 1
+                count += 1
+        self.delivered_count += count
+        return count
+
+    # ===== feedback =====
+    def on_ack(self, next_expected: int, received, now: float) -> int:
+        """
+        Applies one FILE_CHUNK_ACK: every chunk below next_expected plus the
+        indices in received are delivered. In-flight chunks overtaken by
+        FILE_REORDER_THRESHOLD later sends are moved to the lost queue.
+        Returns how many chunks were newly delivered.
+        """
+        next_expected = min(next_expected, self.total_chunks)
+        newly = list(range(self._cumulative, next_expected))
+        self._cumulative = max(self._cumulative, next_expected)
+        newly.extend(i for i in received if 0 <= i < self.total_chunks)
+
+        acked = 0
+        newest = None
+        for index in newly:
+            if self.delivered[index]:
+                continue
+            self.delivered[index] = 1
+            acked += 1
+            entry = self.in_flight.pop(index, None)
+            if entry is None:
+                continue
+            seq, sent_at, retransmitted = entry
+            if seq > self._acked_seq:
+                self._acked_seq = seq
+                newest = None if retransmitted else sent_at
+        self.delivered_count += acked
+
+        if newest is not None:
+            self.rtt.sample(now - newest)  # Karn's rule: first transmissions only
+        if acked:
+            if self.cwnd < self.ssthresh:
+                self.cwnd += acked
+            else:
+                self.cwnd += acked / self.cwnd
+            self.cwnd = min(self.cwnd, self.max_window)
+
+        cutoff = self._acked_seq - FILE_REORDER_THRESHOLD
+        overtaken = [i for i, (seq, _, _) in self.in_flight.items() if seq <= cutoff]
+        if overtaken:
+            self._mark_lost(overtaken, now)
+        return acked
+
+    def on_nack(self, missing, now: float) -> int:
+        """
+        Applies a FILE_NACK. Listed chunks still in flight are resent, unless
+        sent less than an SRTT ago (those may simply not have arrived yet).
+        Returns how many were queued.
+        """
+        min_age = self.rtt.srtt or self.rtt.rto
+        lost = []
+        for index in missing:
+            entry = self.in_flight.get(index)
+            if entry is not None and now - entry[1] >= min_age:
+                lost.append(index)
+        if lost:
+            self._mark_lost(lost, now)
+        return len(lost)
+
+    def _mark_lost(self, indices, now: float):
+        for index in indices:
+            del self.in_flight[index]
+            self.lost.append(index)
+        self.losses += len(indices)
+        if now < self._recovery_until:
+            return
+        self.ssthresh = max(2.0, self.cwnd / 2)
+        self.cwnd = self.ssthresh
+        self._recovery_until = now + (self.rtt.srtt or self.rtt.rto)
+
+    def stats(self) -> dict:
+        return {
+            "CWND": round(self.cwnd, 1),
+            "SRTT_MS": round((self.rtt.srtt or 0) * 1000, 2),
+            "SENT": self.sent,
+            "RETRANSMITS": self.retransmits,
+            "LOSSES": self.losses,
+        }
@@ -1,7 +1,6 @@
-from state import revoked_tokens
-from utils import hash_token
+from token_registry import registry
 
 def handle_revoke(fields, verbose=False):
     token = fields["TOKEN"]
-    revoked_tokens.add(hash_token(token))
+    registry.revoke(token)
     # No output per RFC
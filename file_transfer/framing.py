@@ -0,0 +1,43 @@
+import struct
+
+# ========== Binary FILE_CHUNK Framing ==========
+# Negotiated per transfer (FRAMING in FILE_OFFER / FILE_ACCEPT). A frame is a
+# fixed 28-byte header followed by the raw chunk bytes, so there is no
+# base64 expansion and nothing to parse on receipt:
+#
+#   magic "\x00\xf1" | version | flags | FILEID (16 bytes) | index | total
+#
+# Text messages always start with "TYPE", so the leading NUL tells the two
+# apart. The FILEID is the 128-bit random id from the offer; frames are only
+# accepted from the IP the offer came from, once its TOKEN was validated.
+
+MAGIC = b"\x00\xf1"
+VERSION = 1
+HEADER = struct.Struct("!2sBB16sII")
+
+FLAG_LAST = 0x01  # final chunk of the file
+FLAG_COMPRESSED = 0x02  # payload is compressed with the negotiated codec (compression.py)
+
+def is_frame(data) -> bool:
+    return data[:2] == MAGIC
+
+def can_frame(file_id: str) -> bool:
+    """Only 32-hex-digit FILEIDs (ours are uuid4().hex) fit the header."""
+    try:
+        return len(bytes.fromhex(file_id)) == 16
+    except (TypeError, ValueError):
+        return False
+
+def pack_header_into(buffer, file_id: bytes, index: int, total: int, flags: int = 0):
+    """Writes a frame header into a reusable HEADER.size buffer."""
+    HEADER.pack_into(buffer, 0, MAGIC, VERSION, flags, file_id, index, total)
+
+def unpack(data):
+    """(FILEID hex, index, total, flags, payload view) from a frame; ValueError if malformed."""
+    view = memoryview(data)
+    if len(view) < HEADER.size:
+        raise ValueError("short frame")
+    magic, version, flags, file_id, index, total = HEADER.unpack_from(view)
+    if magic != MAGIC or version != VERSION:
+        raise ValueError("not a chunk frame")
+    return file_id.hex(), index, total, flags, view[HEADER.size:]
@@ -0,0 +1,161 @@
+import queue
+import threading
+import time
+from config import FILE_PIPELINE_DEPTH, FILE_ENCODE_WORKERS
+
+# ========== Send Pipeline ==========
+# Prepares FILE_CHUNKs ahead of the sending thread so disk reads and encoding
+# overlap with the paced sends instead of running between them:
+#
+#   reader thread ──read_q──▶ encoder pool ──ready──▶ sender (take_next / done)
+#
+# The reader walks `indices` (every chunk, or just the missing ones when a
+# transfer resumes). read(index) runs on the reader thread (page faults,
+# disk), encode(index, item, buffer) on one of the encoders (base64,
+# headers), writing into one of `depth` preallocated buffers. take_next()
+# hands chunks to the sender in that order and done() returns the buffer to
+# the pool, so at most `depth` chunks are prepared at a time. Only first
+# transmissions go through here; the sender encodes the occasional resend
+# itself.
+#
+# stats() reports how busy each stage was and how full the queues ran: a
+# full ready queue means the network (the pacing) is the bottleneck, an empty
+# one with busy encoders means encoding is, a busy reader means the disk is.
+
+class ChunkPipeline:
+    def __init__(self, indices, read, encode, buffer_size: int,
+                 depth: int = FILE_PIPELINE_DEPTH, workers: int = FILE_ENCODE_WORKERS):
+        self._indices = indices
+        self._read = read
+        self._encode = encode
+        self._depth = depth
+        self._workers = workers
+        self._read_q = queue.Queue(depth)
+        self._free = queue.Queue()
+        for _ in range(depth):
+            self._free.put(bytearray(buffer_size))
+        self._ready = {}  # position in indices → (chunk index, datagram, buffer)
+        self._taken = 0
+        self._cond = threading.Condition()
+        self._stop = threading.Event()
+        self._error = None
+
+        self._started = time.monotonic()
+        self._read_time = 0.0
+        self._encode_time = 0.0
+        self._send_wait = 0.0  # sender blocked in take_next()
+        self._samples = 0
+        self._read_fill = 0
+        self._ready_fill = 0
+
+        self._threads = [threading.Thread(target=self._reader, daemon=True)]
+        self._threads += [threading.Thread(target=self._encoder, daemon=True) for _ in range(workers)]
+        for t in self._threads:
+            t.start()
+
+    # ===== stages =====
+    def _get(self, q):
+        while not self._stop.is_set():
+            try:
+                return q.get(timeout=0.1)
+            except queue.Empty:
+                pass
+        return None
+
+    def _put(self, q, item) -> bool:
+        while not self._stop.is_set():
+            try:
+                q.put(item, timeout=0.1)
+                return True
+            except queue.Full:
+                pass
+        return False
+
+    def _fail(self, error: Exception):
+        with self._cond:
+            self._error = error
+            self._cond.notify_all()
+
+    def _reader(self):
+        try:
+            for seq, index in enumerate(self._indices):
+                start = time.perf_counter()
+                item = self._read(index)
+                self._read_time += time.perf_counter() - start
+                if not self._put(self._read_q, (seq, index, item)):
+                    return
+        except Exception as e:
+            self._fail(e)
+            return
+        for _ in range(self._workers):
+            self._put(self._read_q, None)
+
+    def _encoder(self):
+        while True:
+            # Buffer first: a worker holding a chunk always has somewhere to
+            # encode it, so the lowest pending index can't starve
+            buffer = self._get(self._free)
+            if buffer is None:
+                return
+            entry = self._get(self._read_q)
+            if entry is None:
+                self._free.put(buffer)
+                return
+            seq, index, item = entry
+            try:
+                start = time.perf_counter()
+                datagram = self._encode(index, item, buffer)
+                elapsed = time.perf_counter() - start
+            except Exception as e:
+                self._fail(e)
+                return
+            with self._cond:
+                self._encode_time += elapsed
+                self._ready[seq] = (index, datagram, buffer)
+                self._cond.notify_all()
+
+    # ===== sender side =====
+    def take_next(self):
+        """(chunk index, datagram, buffer) for the next chunk, waiting until it's encoded."""
+        start = time.perf_counter()
+        with self._cond:
+            self._samples += 1
+            self._read_fill += self._read_q.qsize()
+            self._ready_fill += len(self._ready)
+            while self._taken not in self._ready:
+                if self._error is not None:
+                    raise self._error
+                self._cond.wait()
+            entry = self._ready.pop(self._taken)
+            self._taken += 1
+        self._send_wait += time.perf_counter() - start
+        return entry
+
+    def done(self, datagram, buffer=None):
+        """The datagram was sent: release its views and recycle the buffer."""
+        for part in datagram if isinstance(datagram, list) else (datagram,):
+            if isinstance(part, memoryview):
+                part.release()
+        if buffer is not None:
+            self._free.put(buffer)
+
+    def close(self):
+        """Stops the stages; no views into the file are left afterwards."""
+        self._stop.set()
+        for t in self._threads:
+            t.join()
+        with self._cond:
+            for _, datagram, _ in self._ready.values():
+                self.done(datagram)
+            self._ready.clear()
+
+    def stats(self) -> dict:
+        elapsed = max(time.monotonic() - self._started, 1e-9)
+        samples = max(self._samples, 1)
+        return {
+            "READ_BUSY": round(self._read_time / elapsed, 2),
+            "ENCODE_BUSY": round(self._encode_time / (elapsed * self._workers), 2),
+            "SEND_STALLED": round(self._send_wait / elapsed, 2),
+            "READ_QUEUE": round(self._read_fill / samples / self._depth, 2),
+            "READY_QUEUE": round(self._ready_fill / samples / self._depth, 2),
+        }
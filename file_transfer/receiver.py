@@ -1,78 +1,133 @@
-import base64
+import binascii
+import hashlib
+import json
 import os
+import threading
 import time
 from state import file_transfers, local_profile, get_peer_address
-from utils import validate_token
-from message import build_message
+from utils import validate_token, format_ranges, parse_csv
+from message import build_message, raw_field
 from socket_handler import send_unicast
-from config import settings
-from file_transfer.sender import start_sending_chunks
-from file_transfer.file_session import get_session, remove_session
+from config import (
+    settings, FILE_ACK_EVERY, FILE_NACK_INTERVAL, FILE_STALL_TIMEOUT, FILE_BINARY_FRAMING,
+    FILE_PROGRESS_INTERVAL, FILE_MIN_CHUNK, FILE_MAX_CHUNK, FILE_MAX_CHUNKS,
+)
+from file_transfer.sender import finish_transfer
+from file_transfer.bitmap import ChunkBitmap
+from file_transfer import framing, compression
 from handlers import ack
+import async_engine
+import decisions
+import event_log
 
 
 RECEIVED_DIR = "downloads"
 os.makedirs(RECEIVED_DIR, exist_ok=True)
 
-# Offer reception and manual acceptance logic
+_completed = {}  # FILEID → sender, recent finished transfers (to repeat FILE_RECEIVED)
+
+# Offer reception; the accept / ignore decision is queued (see decisions.py)
 def handle_file_offer(message: dict):
     file_id = message.get("FILEID")
     sender = message.get("FROM")
     filename = message.get("FILENAME")
     filesize = message.get("FILESIZE")
     description = message.get("DESCRIPTION", "")
-    offer_timestamp = message.get("TIMESTAMP")
-    token = message.get("TOKEN")
     sender_ip = get_peer_address(sender)
 
     if not sender_ip:
         print("❌ Cannot respond, sender IP unknown.")
         return
 
+    if file_id:
+        ack.send_ack(sender, file_id)
+    if file_id in file_transfers:
+        return  # repeated offer, already accepted
+
+    try:
+        size = int(filesize)
+    except (TypeError, ValueError):
+        size = None
+
+    # Answered later, when the receive buffer behind message has been reused
+    offer = dict(message)
+    decision_id = decisions.submit(
+        "file", file_id, sender, f"File {filename} ({filesize} bytes) from {sender}",
+        on_accept=lambda: accept_file_offer(offer, sender_ip),
+        on_reject=lambda: ignore_file_offer(offer, sender_ip),
+        size=size,
+    )
+    if decision_id is None:
+        return
+
     if settings["VERBOSE"]:
         print(f"\n📦 Incoming File Offer from {sender}")
         print(f"Filename: {filename}")
         print(f"Size: {filesize} bytes")
         print(f"Description: {description}")
+        print(f"Type 'accept {decision_id}' to receive it or 'reject {decision_id}' to ignore it.")
     else:
-        print(f"User {sender} is sending you a file. (Enter to proceed)")
-
-    # Prompt to accept or ignore
-    choice = input("Do you want to accept the file? (y to accept / anything else to ignore): ").strip().lower()
-    now = int(time.time())
-
-    if choice == "y":
-        print("✅ File accepted. Preparing to receive chunks...")
-        file_transfers[file_id] = {
-            "chunks": {},
-            "expected": None,
-            "filename": filename,
-            "timestamp": offer_timestamp,
-        }
+        print(f"User {sender} is sending you a file. ('accept {decision_id}' / 'reject {decision_id}')")
 
-        response = {
-            "TYPE": "FILE_ACCEPT",
-            "FROM": local_profile["USER_ID"],
-            "TO": sender,
-            "FILEID": file_id,
-            "TIMESTAMP": now,
-        }
-
-    else:
-        print("⏳ File ignored.")
-        response = {
-            "TYPE": "FILE_IGNORED",
-            "FROM": local_profile["USER_ID"],
-            "TO": sender,
-            "FILEID": file_id,
-            "TIMESTAMP": now,
-            "REASON": "User ignored file offer"
-        }
+def accept_file_offer(message: dict, sender_ip: str):
+    file_id = message.get("FILEID")
+    sender = message.get("FROM")
+    token = message.get("TOKEN")
 
+    print("✅ File accepted. Preparing to receive chunks...")
+    # Binary frames carry no TOKEN, so the offer's token is checked here instead
+    offered = (message.get("FRAMING") or "text").split(",")
+    binary = (FILE_BINARY_FRAMING and "binary" in offered and framing.can_frame(file_id)
+              and validate_token(token, expected_scope="file"))
+    codecs = parse_csv(message.get("COMPRESSION") or "")
+    codec = compression.pick_codec(codecs)
+    # CHUNK_SIZE describes the first framing offered; if we pick the other,
+    # the stride is inferred from the chunks
+    chosen = "binary" if binary else "text"
+    chunk_size = message.get("CHUNK_SIZE") if chosen == offered[0] else None
+    resume_key = message.get("RESUME_KEY")
+    transfer = open_transfer(
+        message.get("FILENAME"), message.get("FILESIZE"), _part_key(file_id, sender, resume_key),
+        chunk_size, resume_key)
+    transfer.update({
+        "timestamp": message.get("TIMESTAMP"),
+        "sender": sender,
+        "sender_ip": sender_ip,
+        "framing": chosen,
+        "compression": codec,
+    })
+    file_transfers[file_id] = transfer
+    start_nack_timer()
+
+    response = {
+        "TYPE": "FILE_ACCEPT",
+        "FROM": local_profile["USER_ID"],
+        "TO": sender,
+        "FILEID": file_id,
+        "FRAMING": chosen,
+        "TIMESTAMP": int(time.time()),
+    }
+    if codecs:
+        response["COMPRESSION"] = codec or "none"
+    bitmap = transfer["bitmap"]
+    if bitmap is not None and bitmap.count:
+        # Resuming: tell the sender what we have, at the chunk size it was written with
+        print(f"♻️ Resuming {transfer['filename']}: {bitmap.count}/{bitmap.total} chunks already received")
+        response["CHUNK_SIZE"] = transfer["chunk_size"]
+        response["HAVE"] = _cap_ranges(format_ranges(bitmap.present()), 1200)
     send_unicast(build_message(response), sender_ip)
-    if message.get("FILEID"):
-        ack.send_ack(sender, message["FILEID"])
 
+def ignore_file_offer(message: dict, sender_ip: str):
+    print("⏳ File ignored.")
+    response = {
+        "TYPE": "FILE_IGNORED",
+        "FROM": local_profile["USER_ID"],
+        "TO": message.get("FROM"),
+        "FILEID": message.get("FILEID"),
+        "TIMESTAMP": int(time.time()),
+        "REASON": "User ignored file offer"
+    }
+    send_unicast(build_message(response), sender_ip)
 
 
 def handle_file_chunk(message: dict):
@@ -84,55 +139,394 @@ def handle_file_chunk(message: dict):
         chunk_index = int(message.get("CHUNK_INDEX"))
         total_chunks = int(message.get("TOTAL_CHUNKS"))
         chunk_size = int(message.get("CHUNK_SIZE", 0))
-        data = message.get("DATA")
+        data = raw_field(message, "DATA")
     except (ValueError, TypeError):
-        print("❌ Invalid chunk index or total.")
+        event_log.warn("FILE_CHUNK_INVALID", reason="bad chunk index or total")
         return
 
     if not all([file_id, data, token]):
-        print("❌ Malformed FILE_CHUNK message.")
+        event_log.warn("FILE_CHUNK_INVALID", reason="malformed")
         return
 
     if not validate_token(token, expected_scope="file"):
-        print("❌ Invalid or expired token in FILE_CHUNK.")
+        event_log.warn("FILE_CHUNK_INVALID", reason="invalid or expired token", file_id=file_id)
         return
 
     if file_id not in file_transfers:
-        print(f"⚠️ Unknown FILEID: {file_id}. Ignoring.")
+        if file_id in _completed:
+            send_file_received(sender, file_id)  # our FILE_RECEIVED was lost
+            return
+        event_log.warn("FILE_CHUNK_UNKNOWN", file_id=file_id)
         return
 
-    transfer = file_transfers[file_id]
-    chunks = transfer.setdefault("chunks", {})
-
     try:
-        binary_data = base64.b64decode(data)
-        chunks[chunk_index] = binary_data
-    except Exception as e:
-        print(f"❌ Error decoding chunk: {e}")
+        binary_data = binascii.a2b_base64(data)
+    except binascii.Error:
+        event_log.warn("FILE_CHUNK_INVALID", reason="bad base64", file_id=file_id)
         return
+    compressed = message.get("COMPRESSED") == "1"
+    _store_chunk(file_id, file_transfers[file_id], sender, chunk_index, total_chunks, binary_data, compressed)
 
-    if transfer.get("expected") is None:
-        transfer["expected"] = total_chunks
-
-    received = len(chunks)
-    print(f"[VERBOSE] Received chunk {chunk_index + 1}/{total_chunks} for {transfer.get('filename')}")
-
-    #if received == total_chunks and all(i in chunks for i in range(total_chunks)):
-    if received == total_chunks:
-        chunks_ordered = [chunks[i] for i in range(total_chunks)]
-        filepath = os.path.join(os.getcwd(), "downloads", transfer["filename"])
+def handle_binary_chunk(data, addr):
+    """A framing.py FILE_CHUNK frame; only accepted from the offering peer's address."""
+    try:
+        file_id, chunk_index, total_chunks, flags, payload = framing.unpack(data)
+    except ValueError:
+        event_log.warn("FILE_CHUNK_INVALID", reason="bad frame")
+        return
 
-        with open(filepath, "wb") as f:
-            for chunk in chunks_ordered:
-                f.write(chunk)
+    transfer = file_transfers.get(file_id)
+    if transfer is None:
+        if file_id in _completed:
+            send_file_received(_completed[file_id], file_id)
+            return
+        event_log.warn("FILE_CHUNK_UNKNOWN", file_id=file_id)
+        return
+    if transfer.get("framing") != "binary" or addr[0] != transfer["sender_ip"]:
+        event_log.warn("FILE_CHUNK_INVALID", reason="unexpected binary frame", file_id=file_id, ip=addr[0])
+        return
+    compressed = bool(flags & framing.FLAG_COMPRESSED)
+    _store_chunk(file_id, transfer, transfer["sender"], chunk_index, total_chunks, payload, compressed)
+
+def _store_chunk(file_id: str, transfer: dict, sender: str, chunk_index: int, total_chunks: int,
+                 payload, compressed: bool = False):
+    """Writes one chunk to the .part file and ACKs or completes the transfer."""
+    with transfer["lock"]:
+        if not transfer["done"]:
+            _store_chunk_locked(file_id, transfer, sender, chunk_index, total_chunks, payload, compressed)
+
+def _store_chunk_locked(file_id: str, transfer: dict, sender: str, chunk_index: int, total_chunks: int,
+                        payload, compressed: bool):
+    bitmap = transfer["bitmap"]
+    if bitmap is None:
+        if not _valid_total(transfer, total_chunks):
+            event_log.warn("FILE_CHUNK_INVALID", reason="TOTAL_CHUNKS doesn't fit FILESIZE", file_id=file_id)
+            return
+        bitmap = transfer["bitmap"] = ChunkBitmap(total_chunks)
+    elif total_chunks != bitmap.total:
+        event_log.warn("FILE_CHUNK_INVALID", reason="TOTAL_CHUNKS changed", file_id=file_id)
+        return
+    if not 0 <= chunk_index < bitmap.total:
+        event_log.warn("FILE_CHUNK_INVALID", reason="index out of range", file_id=file_id)
+        return
+    if chunk_index in bitmap:
+        send_chunk_ack(sender, file_id, transfer)  # retransmit, so our ACK was lost
+        return
 
+    try:
+        if compressed:
+            if not transfer["compression"]:
+                raise ValueError("compressed chunk, but no codec was agreed")
+            payload = compression.decompress(transfer["compression"], payload, transfer["chunk_size"] or FILE_MAX_CHUNK)
+        offset = chunk_offset(transfer, chunk_index, len(payload))
+        os.pwrite(transfer["fd"], payload, offset)
+    except Exception as e:
+        event_log.warn("FILE_CHUNK_INVALID", reason=f"cannot store chunk: {e}", file_id=file_id)
+        return
+    bitmap.add(chunk_index)
+    transfer["last_chunk_at"] = time.monotonic()
+    if chunk_index > transfer["highest"]:
+        transfer["highest"] = chunk_index
+
+    event_log.debug("FILE_CHUNK_RECEIVED", file=transfer.get("filename"), chunk=chunk_index + 1, total=total_chunks)
+
+    in_order = chunk_index == transfer["next_expected"]
+    if in_order:
+        ahead = transfer["ahead"]
+        next_expected = chunk_index + 1
+        while next_expected < bitmap.total and next_expected in bitmap:
+            ahead.discard(next_expected)
+            next_expected += 1
+        transfer["next_expected"] = next_expected
+    elif chunk_index > transfer["next_expected"]:
+        transfer["ahead"].add(chunk_index)
+    transfer["since_ack"] += 1
+
+    if bitmap.complete():
+        transfer["done"] = True
+        filepath = finish_file(transfer)
+        discard_progress(transfer)
         print(f"✅ File received and saved to: {filepath}")
+        file_transfers.pop(file_id, None)
+        _completed[file_id] = sender
+        if len(_completed) > 256:
+            del _completed[next(iter(_completed))]
         send_file_received(sender, file_id)
-        if message.get("FILEID"):
-            ack.send_ack(sender, message["FILEID"])
+        ack.send_ack(sender, file_id)
+    elif not in_order or transfer["since_ack"] >= FILE_ACK_EVERY:
+        # A gap is reported at once so the sender can resend early
+        send_chunk_ack(sender, file_id, transfer)
+
+# ========== Disk-backed Reassembly ==========
+# Chunks are written straight to their offset in a preallocated
+# downloads/<name>.<key>.part file, so memory per transfer is just the
+# bitmap, and the .part file is renamed over the final name once every bit is
+# set. The key is a hash of the sender and the RESUME_KEY (or, without one,
+# the FILEID): offers of the same name from different peers, or of different
+# versions, never share a .part file, while a re-offer of the same file finds
+# its earlier one.
+
+def _part_key(file_id: str, sender: str, resume_key: str = None) -> str:
+    key = _digest(f"{sender}|{resume_key or file_id}")
+    if resume_key and any(t["part_key"] == key for t in list(file_transfers.values())):
+        key = _digest(f"{sender}|{file_id}")  # the same file is already coming in under another offer
+    return key
+
+def _digest(key: str) -> str:
+    return hashlib.blake2b(key.encode('utf-8'), digest_size=8).hexdigest()
+
+def open_transfer(filename: str, filesize, part_key: str, chunk_size=None, resume_key: str = None) -> dict:
+    filename = os.path.basename(filename or "") or "download"
+    final_path = os.path.join(os.getcwd(), RECEIVED_DIR, filename)
+    part_path = f"{final_path}.{part_key}.part"
+    try:
+        filesize = int(filesize)
+    except (TypeError, ValueError):
+        filesize = None
+    try:
+        chunk_size = int(chunk_size)
+    except (TypeError, ValueError):
+        chunk_size = None
+
+    resumed = load_progress(part_path, resume_key, filesize) if resume_key else None
+    bitmap = None
+    if resumed is not None:
+        chunk_size, bitmap = resumed
+
+    # Only a resumed .part keeps its contents; a stale one must not leave its tail behind
+    fd = os.open(part_path, os.O_RDWR | os.O_CREAT | (0 if bitmap is not None else os.O_TRUNC), 0o644)
+    if filesize is not None:
+        try:
+            os.posix_fallocate(fd, 0, filesize)
+        except (AttributeError, OSError):
+            os.ftruncate(fd, filesize)
+    next_expected = 0
+    if bitmap is not None:
+        missing = bitmap.missing(0, limit=1)
+        next_expected = missing[0] if missing else bitmap.total
+    return {
+        "filename": filename,
+        "filesize": filesize,
+        "chunk_size": chunk_size,  # offset stride; inferred from the chunks if not offered
+        "fd": fd,
+        "part_path": part_path,
+        "part_key": part_key,
+        "final_path": final_path,
+        "resume_key": resume_key,
+        "bitmap": bitmap,    # ChunkBitmap, created once TOTAL_CHUNKS is known (or loaded on resume)
+        "next_expected": next_expected,  # every chunk below this has arrived
+        "ahead": set(),      # chunks received above next_expected (since the last resume)
+        "since_ack": 0,
+        "highest": bitmap.highest() if bitmap is not None else -1,  # highest chunk index received
+        "last_chunk_at": time.monotonic(),
+        "last_nack_at": 0.0,
+        "saved_count": bitmap.count if bitmap is not None else 0,  # bitmap.count at the last save
+        "saved_at": time.monotonic(),
+        "done": False,       # fd closed: the file is complete, or the transfer stalled
+        "saving": False,     # a progress save (or stall close) is in flight off the event loop
+        "lock": threading.Lock(),  # fd, bitmap and done, between the receive and NACK threads
+    }
+
+def _valid_total(transfer: dict, total_chunks: int) -> bool:
+    """
+    Checks the first chunk's TOTAL_CHUNKS against the offer before the bitmap
+    is sized from it: exact when CHUNK_SIZE is known, else no more chunks than
+    FILE_MIN_CHUNK-byte ones would take.
+    """
+    filesize, chunk_size = transfer["filesize"], transfer["chunk_size"]
+    if filesize is None:
+        return 0 < total_chunks <= FILE_MAX_CHUNKS
+    if chunk_size:
+        return 0 < total_chunks == (filesize + chunk_size - 1) // chunk_size
+    return 0 < total_chunks <= max(1, (filesize + FILE_MIN_CHUNK - 1) // FILE_MIN_CHUNK)
+
+def chunk_offset(transfer: dict, index: int, length: int) -> int:
+    stride = transfer["chunk_size"]
+    if stride is None:
+        total = transfer["bitmap"].total
+        if index < total - 1:
+            stride = length  # every chunk but the last is full size
+        elif total == 1:
+            return 0
+        elif transfer["filesize"] is not None:
+            stride = (transfer["filesize"] - length) // (total - 1)
+        else:
+            raise ValueError("chunk size unknown until a full chunk arrives")
+        transfer["chunk_size"] = stride
+    return index * stride
+
+def finish_file(transfer: dict) -> str:
+    """Closes the .part file and atomically moves it to its final name."""
+    os.close(transfer["fd"])
+    os.replace(transfer["part_path"], transfer["final_path"])
+    return transfer["final_path"]
+
+# ========== Resumable Transfers ==========
+# Progress is saved every FILE_PROGRESS_INTERVAL to <name>.<key>.part.progress next
+# to the .part file: a JSON line (RESUME_KEY, sizes) followed by the raw
+# bitmap. The bitmap is copied under the transfer's lock (a bit is only set
+# after its pwrite) and the .part data synced before it is written, so every
+# bit set on disk is backed by data. Under --async the sync and write run in
+# the event loop's executor (async_engine.run_blocking), not on the loop. A
+# later FILE_OFFER with the same RESUME_KEY (the sender's name, size and
+# mtime of the file) reopens both, and FILE_ACCEPT lists the chunks already
+# here as HAVE so the sender skips them.
+
+def _progress_path(part_path: str) -> str:
+    return part_path + ".progress"
+
+def load_progress(part_path: str, resume_key: str, filesize):
+    """(chunk size, ChunkBitmap) saved for this RESUME_KEY, or None."""
+    try:
+        with open(_progress_path(part_path), "rb") as f:
+            meta = json.loads(f.readline())
+            bits = f.read()
+        if (meta.get("RESUME_KEY") != resume_key or meta.get("FILESIZE") != filesize
+                or not os.path.exists(part_path)):
+            return None
+        chunk_size, total = int(meta["CHUNK_SIZE"]), int(meta["TOTAL_CHUNKS"])
+    except (OSError, ValueError, KeyError, TypeError, AttributeError):
+        return None
+    if chunk_size <= 0 or len(bits) != (total + 7) // 8:
+        return None
+    return chunk_size, ChunkBitmap(total, bits)
+
+def save_progress(transfer: dict):
+    with transfer["lock"]:
+        bitmap = transfer["bitmap"]
+        if not transfer["resume_key"] or bitmap is None or transfer["chunk_size"] is None or transfer["done"]:
+            return
+        count, bits = bitmap.count, bytes(bitmap.bits)  # taken before the sync, so all of it is on disk
+        meta = {
+            "RESUME_KEY": transfer["resume_key"],
+            "FILESIZE": transfer["filesize"],
+            "CHUNK_SIZE": transfer["chunk_size"],
+            "TOTAL_CHUNKS": bitmap.total,
+        }
+        fd = os.dup(transfer["fd"])  # synced outside the lock; finish_file may close the original
+    try:
+        (getattr(os, "fdatasync", None) or os.fsync)(fd)
+    finally:
+        os.close(fd)
+
+    with transfer["lock"]:
+        if transfer["done"]:
+            return  # completed meanwhile, and its progress discarded
+        path = _progress_path(transfer["part_path"])
+        with open(path + ".tmp", "wb") as f:
+            f.write(json.dumps(meta).encode('utf-8') + b"\n")
+            f.write(bits)
+        os.replace(path + ".tmp", path)
+        transfer["saved_count"] = count
+        transfer["saved_at"] = time.monotonic()
+
+def discard_progress(transfer: dict):
+    try:
+        os.remove(_progress_path(transfer["part_path"]))
+    except OSError:
+        pass
+
+def _cap_ranges(ranges: str, limit: int = 1000) -> str:
+    """Trims a range list to whole entries so the datagram stays small."""
+    if len(ranges) <= limit:
+        return ranges
+    return ranges[:ranges.rindex(",", 0, limit)]
+
+def send_chunk_ack(to_user_id: str, file_id: str, transfer: dict):
+    """FILE_CHUNK_ACK: cumulative NEXT_EXPECTED plus ranges received above it."""
+    transfer["since_ack"] = 0
+    received = _cap_ranges(format_ranges(sorted(transfer["ahead"])))
+    response = {
+        "TYPE": "FILE_CHUNK_ACK",
+        "FROM": local_profile["USER_ID"],
+        "TO": to_user_id,
+        "FILEID": file_id,
+        "NEXT_EXPECTED": transfer["next_expected"],
+        "RECEIVED": received,
+    }
+    sender_ip = transfer.get("sender_ip") or get_peer_address(to_user_id)
+    if sender_ip:
+        send_unicast(build_message(response), sender_ip)
+
+# ========== Selective-repeat Recovery ==========
+# A timer (async_engine.schedule_every) looks at every open transfer each
+# FILE_NACK_INTERVAL and sends FILE_NACK with the MISSING ranges: gaps below the highest chunk seen,
+# or, once nothing has arrived for a few intervals, everything still missing
+# (the tail of the file may be what was lost). The sender resends only those.
+# The timer and the receive path share a transfer under its "lock"; whichever
+# closes the .part file (completion or a stall) sets "done" first.
+
+def start_nack_timer():
+    async_engine.schedule_every(FILE_NACK_INTERVAL, check_transfers, "file-nack-timer")
+
+def check_transfers():
+    now = time.monotonic()
+    for file_id, transfer in list(file_transfers.items()):
+        try:
+            check_transfer(file_id, transfer, now)
+        except Exception as e:
+            event_log.debug("FILE_NACK_ERROR", file_id=file_id, error=e)
+
+def check_transfer(file_id: str, transfer: dict, now: float):
+    bitmap = transfer["bitmap"]
+    stalled = now - transfer["last_chunk_at"] > FILE_STALL_TIMEOUT
+    if not transfer["saving"] and (stalled or bitmap is not None and bitmap.count != transfer["saved_count"]
+                                   and now - transfer["saved_at"] >= FILE_PROGRESS_INTERVAL):
+        transfer["saving"] = True
+        async_engine.run_blocking(_save_and_close_stalled, file_id, transfer, stalled)
+    if not stalled:
+        with transfer["lock"]:
+            if not transfer["done"]:
+                _check_transfer_locked(file_id, transfer, now)
+
+def _save_and_close_stalled(file_id: str, transfer: dict, stalled: bool):
+    """Saves progress, then closes the transfer if it stalled; closing first would skip the save."""
+    try:
+        bitmap = transfer["bitmap"]
+        if bitmap is not None and bitmap.count != transfer["saved_count"]:
+            save_progress(transfer)
+        if stalled:
+            _close_stalled(file_id, transfer)
+    finally:
+        transfer["saving"] = False
+
+def _close_stalled(file_id: str, transfer: dict):
+    with transfer["lock"]:
+        if transfer["done"] or time.monotonic() - transfer["last_chunk_at"] <= FILE_STALL_TIMEOUT:
+            return  # completed, or chunks started arriving again
+        transfer["done"] = True
+        os.close(transfer["fd"])
+        file_transfers.pop(file_id, None)
+    print(f"❌ Transfer of {transfer['filename']} stalled; partial data kept in {transfer['part_path']}")
+
+def _check_transfer_locked(file_id: str, transfer: dict, now: float):
+    bitmap = transfer["bitmap"]
+    idle = now - transfer["last_chunk_at"]
+    if bitmap is None or now - transfer["last_nack_at"] < FILE_NACK_INTERVAL:
+        return
 
+    if idle >= 3 * FILE_NACK_INTERVAL:
+        end = bitmap.total  # stalled: the tail may be lost too
+    else:
+        end = transfer["highest"]
+    missing = bitmap.missing(transfer["next_expected"], end, limit=1024)
+    if not missing:
+        return
+    transfer["last_nack_at"] = now
+
+    response = {
+        "TYPE": "FILE_NACK",
+        "FROM": local_profile["USER_ID"],
+        "TO": transfer["sender"],
+        "FILEID": file_id,
+        "MISSING": _cap_ranges(format_ranges(missing)),
+    }
+    send_unicast(build_message(response), transfer["sender_ip"])
+    event_log.debug("FILE_NACK_SENT", file_id=file_id, missing=len(missing))
 
 def handle_file_received(message: dict, verbose=False):
+    finish_transfer(message.get("FILEID"))
+
     # do nothing unless in verbose mode
     if not settings["VERBOSE"]:
         return
@@ -155,22 +549,5 @@ def send_file_received(to_user_id: str, file_id: str):
     }
 
     sender_ip = get_peer_address(to_user_id)
-    session = get_session(file_id)
     if sender_ip:
-        if session:
-            remove_session(file_id)
         send_unicast(build_message(ack), sender_ip)
-
-def handle_file_accept(message: dict):
-    file_id = message.get("FILEID")
-    to_user = message.get("FROM")
-    session = get_session(file_id)
-    print(f"[VERBOSE] ✅ File offer accepted by {to_user} (FILEID: {file_id})")
-
-    # Reconstruct original file path based on FILEID
-    if file_id in file_transfers:
-        original_filename = file_transfers[file_id]["filename"]
-        original_path = os.path.join(os.getcwd(), "downloads", original_filename)
-        start_sending_chunks(file_id, to_user, original_path)
-    if not session:
-        print("⚠️ No matching file transfer session found.")
@@ -1,14 +1,22 @@
 import os
-import base64
+import binascii
+import contextlib
+import hashlib
+import mimetypes
+import mmap
 import uuid
+import threading
 import time
-from utils import generate_token
+from utils import generate_token, parse_ranges, iter_ranges
 from state import local_profile, get_peer_address
-from message import build_message
-from socket_handler import send_unicast
+from message import build_message, MessageTemplate
+from socket_handler import send_unicast, send_datagram
+from config import FILE_MAX_RETRIES, FILE_BINARY_FRAMING
 from file_transfer.file_session import register_session, get_session, remove_session
-
-CHUNK_SIZE = 4096 
+from file_transfer.congestion import WindowController
+from file_transfer.pipeline import ChunkPipeline
+from file_transfer import framing, chunking, compression
+import event_log
 
 def send_file_offer(to_user_id, file_path, description=""):
     if not os.path.isfile(file_path):
@@ -17,13 +25,24 @@ def send_file_offer(to_user_id, file_path, description=""):
 
     filename = os.path.basename(file_path)
     filesize = os.path.getsize(file_path)
-    filetype = "application/octet-stream"  # Default MIME type
+    filetype = mimetypes.guess_type(file_path)[0] or "application/octet-stream"
     file_id = uuid.uuid4().hex
 
     timestamp = int(time.time())
     ttl = 3600
     token = generate_token(user_id=local_profile["USER_ID"], scope="file", ttl=ttl, timestamp=timestamp)
 
+    peer_ip = get_peer_address(to_user_id)
+    if not peer_ip:
+        print(f"❌ Could not find IP for {to_user_id}")
+        return
+
+    # CHUNK_SIZE is for the first framing listed; a receiver that picks the
+    # other gets chunks sized for its choice
+    binary = FILE_BINARY_FRAMING and framing.can_frame(file_id)
+    codecs = compression.choose_codecs(file_path, filetype)
+    chunk_size = _chunk_size(peer_ip, binary, to_user_id, file_id, token)
+
     offer_msg = {
         "TYPE": "FILE_OFFER",
         "FROM": local_profile["USER_ID"],
@@ -32,22 +51,26 @@ def send_file_offer(to_user_id, file_path, description=""):
         "FILESIZE": filesize,
         "FILETYPE": filetype,
         "FILEID": file_id,
+        "CHUNK_SIZE": chunk_size,
+        "FRAMING": "binary,text" if binary else "text",
+        "RESUME_KEY": _resume_key(file_path),
         "DESCRIPTION": description,
         "TIMESTAMP": timestamp,
         "TOKEN": token
     }
+    if codecs:
+        offer_msg["COMPRESSION"] = ",".join(codecs)
 
-    peer_ip = get_peer_address(to_user_id)
-    if not peer_ip:
-        print(f"❌ Could not find IP for {to_user_id}")
-        return
-    
     # ✅ Register session here so it can be accessed on accept
-    total_chunks = (filesize + CHUNK_SIZE - 1) // CHUNK_SIZE
+    total_chunks = (filesize + chunk_size - 1) // chunk_size
     register_session(file_id, {
         "filename": file_path,
         "recipient": to_user_id,
+        "filesize": filesize,
         "total_chunks": total_chunks,
+        "chunk_size": chunk_size,
+        "framing": "binary" if binary else "text",
+        "codecs": codecs,
         "token": token,
     })
 
@@ -55,48 +78,54 @@ def send_file_offer(to_user_id, file_path, description=""):
     return file_id  # Needed for follow-up chunk sending
 
 
-def send_file_chunks(to_user_id, file_path, file_id):
-    chunk_size = 1024  # Max per RFC is sender-defined
-    timestamp = int(time.time())
-    ttl = 3600  # or any value you want
-    print("sending files from ", local_profile["USER_ID"], " to ", to_user_id)
-    token = generate_token(user_id=local_profile["USER_ID"], scope="file", ttl=ttl, timestamp=timestamp)
-    with open(file_path, "rb") as f:
-        data = f.read()
-
-    total_chunks = (len(data) + chunk_size - 1) // chunk_size
-
-    for idx in range(total_chunks):
-        chunk = data[idx * chunk_size:(idx + 1) * chunk_size]
-        encoded = base64.b64encode(chunk).decode()
-
-        chunk_msg = {
-            "TYPE": "FILE_CHUNK",
-            "FROM": local_profile["USER_ID"],
-            "TO": to_user_id,
-            "FILEID": file_id,
-            "CHUNK_INDEX": idx,
-            "TOTAL_CHUNKS": total_chunks,
-            "CHUNK_SIZE": len(chunk),
-            "TOKEN": token,
-            "DATA": encoded
-        }
+def _resume_key(path: str) -> str:
+    """Names this version of the file across restarts (name, size, mtime), for resuming."""
+    st = os.stat(path)
+    key = f"{os.path.basename(path)}|{st.st_size}|{st.st_mtime_ns}"
+    return hashlib.blake2b(key.encode('utf-8'), digest_size=16).hexdigest()
 
-        peer_ip = get_peer_address(to_user_id)
-        if not peer_ip:
-            print(f"❌ Could not find IP for {to_user_id}")
-            return
+def _chunk_size(peer_ip: str, binary: bool, to_user_id: str, file_id: str, token: str) -> int:
+    """Chunk payload size that keeps each FILE_CHUNK datagram within the path MTU."""
+    if binary:
+        return chunking.chunk_size(peer_ip, framing.HEADER.size)
+    # Widest possible text header: every numeric field at its maximum length
+    header = build_message({
+        "TYPE": "FILE_CHUNK",
+        "FROM": local_profile["USER_ID"],
+        "TO": to_user_id,
+        "FILEID": file_id,
+        "TOTAL_CHUNKS": 2**32 - 1,
+        "TOKEN": token,
+        "CHUNK_INDEX": 2**32 - 1,
+        "CHUNK_SIZE": 2**32 - 1,
+        "COMPRESSED": 1,
+        "DATA": "",
+    })
+    return chunking.chunk_size(peer_ip, len(header.encode('utf-8')), base64=True)
 
-        send_unicast(build_message(chunk_msg), peer_ip)
+def _map_file(f, size: int):
+    """Read-only mmap of the open file; chunks are sliced from it, never copied."""
+    if size == 0:
+        return contextlib.nullcontext(b"")  # empty files can't be mapped
+    return mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
 
-def start_sending_chunks(file_id: str, to_user_id: str, filepath: str):
+def start_sending_chunks(file_id: str, to_user_id: str, filepath: str, binary: bool = False):
+    """
+    Streams the file as FILE_CHUNKs under a congestion window (see
+    congestion.py): at most cwnd chunks are unacknowledged, sends are paced
+    at the window's rate, and chunks reported or timed out as lost are sent
+    again. Chunks are sliced from an mmap of the file, so memory use doesn't
+    grow with its size, and read and encoded ahead by a ChunkPipeline (see
+    pipeline.py). Blocks until the receiver has every chunk, so run it on its
+    own thread (handle_file_accept does). With binary=True the chunks go out
+    as framing.py frames instead of text messages.
+    """
     if not os.path.exists(filepath):
         print(f"❌ File not found: {filepath}")
         return
 
     try:
         filesize = os.path.getsize(filepath)
-        total_chunks = (filesize + CHUNK_SIZE - 1) // CHUNK_SIZE
         token = generate_token(user_id=local_profile["USER_ID"], scope="file")
 
         peer_ip = get_peer_address(to_user_id)
@@ -105,27 +134,120 @@ def start_sending_chunks(file_id: str, to_user_id: str, filepath: str):
             print(f"❌ Cannot send chunks, IP unknown for {to_user_id}")
             return
 
-        with open(filepath, "rb") as f:
-            for index in range(total_chunks):
-                chunk_data = f.read(CHUNK_SIZE)
-                encoded_data = base64.b64encode(chunk_data).decode("utf-8")
-
-                chunk_message = {
-                    "TYPE": "FILE_CHUNK",
-                    "FROM": local_profile["USER_ID"],
-                    "TO": to_user_id,
-                    "FILEID": file_id,
-                    "CHUNK_INDEX": str(index),
-                    "TOTAL_CHUNKS": str(total_chunks),
-                    "CHUNK_SIZE": str(len(chunk_data)),
-                    "DATA": encoded_data,
-                    "TOKEN": token
-                }
-
-                send_unicast(build_message(chunk_message), peer_ip)
-                time.sleep(0.05)  # slight delay to prevent flooding
+        session = get_session(file_id)
+        if session is None:
+            session = {"filename": filepath, "recipient": to_user_id}
+            register_session(file_id, session)
+        codec = session.get("compression")
+        chunk_size = session.get("chunk_size") or _chunk_size(peer_ip, binary, to_user_id, file_id, token)
+        total_chunks = session["total_chunks"] = (filesize + chunk_size - 1) // chunk_size
+        window = session["window"] = WindowController(total_chunks, chunk_size)
+        if session.get("have"):
+            resumed = window.mark_delivered(iter_ranges(session["have"], total_chunks))
+            print(f"♻️ Resuming {os.path.basename(filepath)}: {resumed}/{total_chunks} chunks already at {to_user_id}")
+
+        # Header fields are fixed for the whole transfer, only these vary
+        varying = ("CHUNK_INDEX", "CHUNK_SIZE", "COMPRESSED", "DATA") if codec else ("CHUNK_INDEX", "CHUNK_SIZE", "DATA")
+        template = MessageTemplate({
+            "TYPE": "FILE_CHUNK",
+            "FROM": local_profile["USER_ID"],
+            "TO": to_user_id,
+            "FILEID": file_id,
+            "TOTAL_CHUNKS": total_chunks,
+            "TOKEN": token,
+        }, varying)
+
+        raw_id = bytes.fromhex(file_id) if binary else None
+        if binary:
+            buffer_size = framing.HEADER.size  # the payload is sent straight from the mapping
+        else:
+            widest = [2**32 - 1] * (len(varying) - 1)
+            buffer_size = len(template.render(*widest, b"")) + (chunk_size + 2) // 3 * 4
+
+        def prefault(index):
+            """Reader stage: touch each page of the chunk so the disk read happens here."""
+            offset = index * chunk_size
+            with data[offset:offset + chunk_size:mmap.PAGESIZE] as pages:
+                bytes(pages)
+
+        def encode(index, _, buffer):
+            """Encoder stage: the datagram for one chunk, built in buffer."""
+            offset = index * chunk_size
+            chunk = data[offset:offset + chunk_size]
+            size = len(chunk)
+            payload, compressed = chunk, False
+            if codec:
+                packed = compression.compress(codec, chunk)
+                if len(packed) < size:  # otherwise the chunk goes out raw
+                    payload, compressed = packed, True
+                    chunk.release()
+            if binary:
+                flags = framing.FLAG_LAST if index == total_chunks - 1 else 0
+                if compressed:
+                    flags |= framing.FLAG_COMPRESSED
+                framing.pack_header_into(buffer, raw_id, index, total_chunks, flags)
+                return [buffer, payload]
+            encoded_data = binascii.b2a_base64(payload, newline=False)
+            chunk.release()
+            if codec:
+                return template.render_into(buffer, index, size, int(compressed), encoded_data)
+            return template.render_into(buffer, index, size, encoded_data)
+
+        attempts = bytearray(total_chunks)
+        pending = bytes(window.delivered)  # snapshot: the chunks to send first time round
+        fresh_left = total_chunks - window.delivered_count
+        next_send = time.monotonic()
+        resend_buffer = bytearray(buffer_size)
+
+        with open(filepath, "rb") as f, _map_file(f, filesize) as mapped, memoryview(mapped) as data:
+            indices = (i for i in range(total_chunks) if not pending[i])
+            pipeline = ChunkPipeline(indices, prefault, encode, buffer_size)
+            try:
+                while True:
+                    with window.cond:
+                        index = fresh = None
+                        while not window.complete():
+                            now = time.monotonic()
+                            window.check_timeouts(now)
+                            if window.can_send():
+                                index = window.next_lost()
+                                fresh = index is None and fresh_left > 0
+                                if index is not None or fresh:
+                                    break
+                            window.cond.wait(window.next_timeout(now))
+                        if index is None and not fresh:
+                            break
+
+                    if fresh:
+                        fresh_left -= 1
+                        index, datagram, buffer = pipeline.take_next()
+                        attempts[index] += 1
+                    else:
+                        attempts[index] += 1
+                        if attempts[index] > FILE_MAX_RETRIES:
+                            print(f"❌ Transfer of {os.path.basename(filepath)} to {to_user_id} failed: no response.")
+                            chunking.record_loss(peer_ip, window.sent, window.losses)
+                            remove_session(file_id)
+                            return
+                        # Resends are rebuilt from the mapping, so nothing is kept per chunk
+                        datagram, buffer = encode(index, None, resend_buffer), None
+
+                    delay = next_send - time.monotonic()
+                    if delay > 0:
+                        time.sleep(delay)
+                    send_datagram(datagram, peer_ip)
+                    pipeline.done(datagram, buffer)
+
+                    with window.cond:
+                        now = time.monotonic()
+                        window.on_sent(index, now, attempts[index] > 1)
+                        next_send = max(next_send, now - window.pacing_interval()) + window.pacing_interval()
+            finally:
+                pipeline.close()
 
         print(f"✅ All chunks sent to {to_user_id} for FILEID {file_id}")
+        event_log.debug("FILE_SEND_DONE", file_id=file_id, chunk_size=chunk_size, **window.stats(), **pipeline.stats())
+        chunking.record_loss(peer_ip, window.sent, window.losses)
         remove_session(file_id)
 
     except Exception as e:
@@ -140,7 +262,67 @@ def handle_file_accept(message: dict):
     if not session:
         print(f"⚠️ No matching file transfer session found for FILEID: {file_id}")
         return
+    if "window" in session:
+        return  # FILE_ACCEPT repeated, already sending
 
-    # Use the registered session values
+    # Use the registered session values; the send loop must not run on the receive thread
     filepath = session["filename"]
-    start_sending_chunks(file_id, to_user, filepath)
+    session["window"] = None
+    binary = message.get("FRAMING") == "binary" and FILE_BINARY_FRAMING and framing.can_frame(file_id)
+    if session.get("framing") != ("binary" if binary else "text"):
+        session["chunk_size"] = None  # the offered CHUNK_SIZE was for the other framing
+    session["framing"] = "binary" if binary else "text"
+    codec = message.get("COMPRESSION")
+    session["compression"] = codec if codec in session.get("codecs", ()) else None
+    if message.get("HAVE"):
+        # Resuming: the receiver's .part file fixes the chunk size
+        try:
+            chunk_size = int(message.get("CHUNK_SIZE"))
+            if chunk_size > 0:
+                total_chunks = (session["filesize"] + chunk_size - 1) // chunk_size
+                for _ in iter_ranges(message["HAVE"], total_chunks):  # validate before trusting it
+                    pass
+                session["chunk_size"] = chunk_size
+                session["have"] = message["HAVE"]
+        except (TypeError, ValueError):
+            event_log.warn("FILE_ACCEPT_INVALID", reason="bad CHUNK_SIZE or HAVE", file_id=file_id)
+    threading.Thread(target=start_sending_chunks, args=(file_id, to_user, filepath, binary), daemon=True).start()
+
+def handle_chunk_ack(message: dict):
+    """FILE_CHUNK_ACK from the receiver: feeds the transfer's congestion window."""
+    session = get_session(message.get("FILEID"))
+    window = session.get("window") if session else None
+    if window is None:
+        return
+    try:
+        next_expected = int(message.get("NEXT_EXPECTED", 0))
+        received = parse_ranges(message.get("RECEIVED", ""), window.total_chunks)
+    except ValueError:
+        return
+    with window.cond:
+        window.on_ack(next_expected, received, time.monotonic())
+        window.cond.notify()
+
+def handle_nack(message: dict):
+    """FILE_NACK from the receiver: resend just the MISSING chunks."""
+    session = get_session(message.get("FILEID"))
+    window = session.get("window") if session else None
+    if window is None:
+        return
+    try:
+        missing = parse_ranges(message.get("MISSING", ""), window.total_chunks)
+    except ValueError:
+        return
+    with window.cond:
+        if window.on_nack(missing, time.monotonic()):
+            window.cond.notify()
+
+def finish_transfer(file_id: str):
+    """FILE_RECEIVED: the receiver has the whole file, stop sending."""
+    session = get_session(file_id)
+    window = session.get("window") if session else None
+    if window is None:
+        return
+    with window.cond:
+        window.on_ack(window.total_chunks, (), time.monotonic())
+        window.cond.notify()
@@ -4,20 +4,30 @@ from message import build_message
 from socket_handler import send_unicast
 from state import peers
 from config import settings
+from dedup import Deduplicator
+import reliability
+import event_log
 
-# Track ACKs we've already sent (to avoid duplicates)
-_sent_acks = set()
+# Track ACKs we've already sent (to avoid duplicates), bounded like seen_message_ids
+_sent_acks = Deduplicator(capacity=20000)
 
 def send_ack(to_user_id, original_message_id):
-    if original_message_id in _sent_acks:
-        return  # Skip duplicate ACK
-
     addr = peers.get(to_user_id, {}).get("ADDRESS")
     if not addr:
         if settings["VERBOSE"]:
             print(f"⚠️: Could not find address for user {to_user_id}")
         return
 
+    send_ack_to(addr, original_message_id)
+
+def send_ack_to(ip, original_message_id, force=False):
+    """
+    ACKs a message straight to the IP it came from. force re-sends an ACK we
+    already sent, for when the peer retransmits because our ACK was lost.
+    """
+    if not force and original_message_id in _sent_acks:
+        return  # Skip duplicate ACK
+
     ack_payload = {
         "TYPE": "ACK",
         "MESSAGE_ID": original_message_id,
@@ -25,11 +35,10 @@ def send_ack(to_user_id, original_message_id):
     }
 
     message = build_message(ack_payload)
-    send_unicast(message, addr)
+    send_unicast(message, ip)
     _sent_acks.add(original_message_id)
 
-    if settings["VERBOSE"]:
-        print(f"📨: Sent ACK for message {original_message_id} to {to_user_id}")
+    event_log.debug("ACK_SENT", id=original_message_id, dst=ip)
 
 # ===== Handle received ACKs =====
 def handle(msg: dict, addr: tuple):
@@ -45,16 +54,9 @@ def handle(msg: dict, addr: tuple):
     message_id = msg["MESSAGE_ID"]
     status = msg["STATUS"]
     from_ip = addr[0]
+    reliability.acknowledge(message_id, addr)
 
     # Try to resolve the sender's user ID
-    sender_id = None
-    for uid, info in peers.items():
-        if info.get("ADDRESS") == from_ip:
-            sender_id = uid
-            break
-
-    if settings["VERBOSE"]:
-        print(f"📫: Received ACK from {sender_id or from_ip} for message {message_id}, status: {status}")
-    else:
-        # print(f"{GREEN}✅ Message {message_id} was acknowledged by {sender_id or from_ip}.{RESET}")
-        pass
\ No newline at end of file
+    sender_id = peers.find_by_address(from_ip)
+
+    event_log.debug("ACK_RECEIVED", id=message_id, src=sender_id or from_ip, status=status)
\ No newline at end of file
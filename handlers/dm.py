@@ -4,9 +4,11 @@ from utils import (
     generate_message_id, current_unix_timestamp, generate_token,
     RED, GREEN, YELLOW, CYAN, RESET
 )
-from state import peers, tokens, revoked_tokens, dm_history, local_profile, get_peer_address
+from state import peers, tokens, dm_history, local_profile, get_peer_address
 from config import settings
 from handlers.ack import send_ack  # ✅ Added
+from token_registry import registry
+import event_log
 
 # ========== Receive ==========
 def handle(msg: dict, addr: tuple):
@@ -15,29 +17,25 @@ def handle(msg: dict, addr: tuple):
 
     required = ["TYPE", "FROM", "TO", "CONTENT", "TIMESTAMP", "MESSAGE_ID", "TOKEN"]
     if not all(k in msg for k in required):
-        if settings["VERBOSE"]:
-            print(f"{YELLOW}⚠️ Malformed DM message received.{RESET}")
+        event_log.debug("DM_INVALID", reason="malformed", src=addr[0])
         return
 
     # Validate that the DM is for this local user
     recipient = msg["TO"]
     if recipient.lower() != local_profile["USER_ID"].lower():
-        if settings["VERBOSE"]:
-            print(f"{YELLOW}📩 Ignored DM not for us ({recipient} ≠ {local_profile['USER_ID']}){RESET}")
+        event_log.debug("DM_NOT_FOR_US", to=recipient, src=addr[0])
         return
 
     # Token validation
     token = msg["TOKEN"]
-    if not token or token in revoked_tokens:
-        if settings["VERBOSE"]:
-            print(f"{RED}❌ Rejected DM: invalid or revoked token.{RESET}")
+    if not token or registry.is_revoked(token):
+        event_log.debug("DM_REJECTED", reason="invalid or revoked token", src=addr[0])
         return
 
-    if token in tokens:
-        expiry = tokens[token]["EXPIRES_AT"]
-        if current_unix_timestamp() > expiry:
-            if settings["VERBOSE"]:
-                print(f"{RED}❌ Rejected DM: expired token.{RESET}")
+    record = registry.lookup(token)
+    if record is not None:
+        if current_unix_timestamp() > record.expires:
+            event_log.debug("DM_REJECTED", reason="expired token", src=addr[0])
             return
 
     sender = msg["FROM"]
@@ -46,11 +44,8 @@ def handle(msg: dict, addr: tuple):
     display_name = peers.get(sender, {}).get("NAME", sender)
 
     # ✅ Print DM
-    if settings["VERBOSE"]:
-        print(f"\n{CYAN}{msg}{RESET}\n")
-        print(f"\n{CYAN}💬 DM received from {sender} to {recipient}:{RESET} {content}")
-    else:
-        print(f"{CYAN}{display_name}:{RESET} {content}\n")
+    event_log.debug("DM_RECEIVED", user=sender, id=msg["MESSAGE_ID"], timestamp=timestamp)
+    print(f"{CYAN}{display_name}:{RESET} {content}\n")
 
     dm_history.append({
         "FROM": sender,
@@ -72,18 +67,11 @@ def cli_send():
     print(f"{CYAN}Known peers:{RESET}")
     for uid, info in peers.items():
         name = info.get("NAME", "")
-        ip = get_peer_address(uid)
+        ip = info.get("ADDRESS")
         print(f" - {uid} @ {ip} (name: {name})")
 
     input_uid = input("Recipient USER ID: ").strip()
-    input_username = input_uid.split("@")[0].lower()
-
-    matched_uid = None
-    for uid in peers:
-        peer_username = uid.split("@")[0].lower()
-        if peer_username == input_username:
-            matched_uid = uid
-            break
+    matched_uid = peers.find_by_username(input_uid)
 
     if not matched_uid:
         print(f"{RED}❌ Unknown recipient.{RESET}")
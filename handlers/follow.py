@@ -6,8 +6,8 @@ from utils import (
     validate_token,
     RED, GREEN, YELLOW, CYAN, BLUE, RESET
 )
-from state import local_profile, peers, follow_map, revoked_tokens
-from config import settings
+from state import local_profile, peers, follow_map
+import event_log
 
 # ========== RECEIVE ==========
 # ========== RECEIVE ==========
@@ -22,46 +22,25 @@ def handle(msg: dict, addr: tuple):
     if to_id != local_profile["USER_ID"] or not from_id or not token or not timestamp:
         return
 
+    # Revoked tokens are rejected here too
     if not validate_token(token, "FOLLOW"):
         print(f"{YELLOW}⚠️ Invalid or expired token from {from_id}. Ignoring {msg_type}.{RESET}")
         return
-    
-    if token in revoked_tokens:
-        print("❌ Cannot send, token has been revoked.")
-        return
 
 
     if msg_type == "FOLLOW":
         if from_id not in follow_map:
             follow_map[from_id] = {}
 
-        if settings["VERBOSE"]:
-            print(f"""{CYAN}[{timestamp}] < {addr[0]}:{addr[1]}
-{BLUE}TYPE:{RESET} FOLLOW
-{BLUE}MESSAGE_ID:{RESET} {message_id}
-{BLUE}FROM:{RESET} {from_id}
-{BLUE}TO:{RESET} {to_id}
-{BLUE}TIMESTAMP:{RESET} {timestamp}
-{BLUE}TOKEN: {token}{RESET}\n""")
-            print(f"User {from_id.split('@')[0]} has followed you")
-        else:
-            print(f"User {from_id.split('@')[0]} has followed you")
+        event_log.debug("FOLLOW_RECEIVED", user=from_id, id=message_id, src=f"{addr[0]}:{addr[1]}", timestamp=timestamp)
+        print(f"User {from_id.split('@')[0]} has followed you")
 
     elif msg_type == "UNFOLLOW":
         if from_id in follow_map:
             del follow_map[from_id]
 
-        if settings["VERBOSE"]:
-            print(f"""{CYAN}[{timestamp}] < {addr[0]}:{addr[1]}
-{BLUE}TYPE:{RESET} UNFOLLOW
-{BLUE}MESSAGE_ID:{RESET} {message_id}
-{BLUE}FROM:{RESET} {from_id}
-{BLUE}TO:{RESET} {to_id}
-{BLUE}TIMESTAMP:{RESET} {timestamp}
-{BLUE}TOKEN: {token}{RESET}\n""")
-            print(f"User {from_id.split('@')[0]} has unfollowed you")
-        else:
-            print(f"User {from_id.split('@')[0]} has unfollowed you")
+        event_log.debug("UNFOLLOW_RECEIVED", user=from_id, id=message_id, src=f"{addr[0]}:{addr[1]}", timestamp=timestamp)
+        print(f"User {from_id.split('@')[0]} has unfollowed you")
 
 # ========== CLI ==========
 def cli_follow():
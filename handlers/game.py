@@ -1,8 +1,10 @@
 import random
 from utils import generate_token, current_unix_timestamp, generate_message_id
-from socket_handler import send_udp
+from socket_handler import send_unicast
 from state import local_profile, peers
 from message import build_message
+from handlers import ack
+import decisions
 
 # --- Game State ---
 game_state = {
@@ -15,16 +17,21 @@ game_state = {
     "turn": 0,
 }
 
-# For ACK
+# For ACK: MESSAGE_ID → message, until the opponent ACKs it (or we give up)
 ack_pending = {}
 
 def send_ack(msg_id, addr):
-    ack = {
-        "TYPE": "ACK",
-        "MESSAGE_ID": msg_id,
-        "STATUS": "RECEIVED"
-    }
-    send_udp(build_message(ack), addr[0])
+    ack.send_ack_to(addr[0], msg_id)
+
+def _delivered(msg_id, delivered):
+    msg = ack_pending.pop(msg_id, None)
+    if not delivered and msg:
+        print(f"⚠️ {msg['TYPE']} to {msg['TO']} was not acknowledged.")
+
+def send_game_message(msg, address):
+    """Sends a game message and tracks it in ack_pending until it's ACKed."""
+    ack_pending[msg["MESSAGE_ID"]] = msg
+    send_unicast(build_message(msg), address, on_complete=_delivered)
 
 
 def handle(msg, addr):
@@ -57,21 +64,30 @@ def handle_invite(msg, addr):
         return  # Not for us
 
     display = peers.get(from_id, {}).get("DISPLAY_NAME", from_id)
-    print(f"\n🎮 {display} is inviting you to play Tic Tac Toe as {('O' if symbol == 'X' else 'X')}.")
+    my_symbol = "O" if symbol == "X" else "X"
 
-    choice = input("Accept? (y/n): ").strip().lower()
-    if choice == "y":
+    def accept():
         game_state["opponent"] = from_id
         game_state["board"] = [" "] * 9
         game_state["my_turn"] = False  # inviter moves first
-        game_state["symbol"] = "O" if symbol == "X" else "X"
+        game_state["symbol"] = my_symbol
         game_state["opponent_symbol"] = symbol
         game_state["gameid"] = gameid
         game_state["turn"] = 1
         print("✅ Game accepted. Waiting for opponent’s move.")
-    else:
+
+    def reject():
         print("❌ Game invite rejected.")
 
+    # Answered from the CLI (or by policy); never prompt on the receive thread
+    decision_id = decisions.submit(
+        "game", gameid, from_id, f"Tic Tac Toe invite from {display} (you'd play {my_symbol})",
+        on_accept=accept, on_reject=reject,
+    )
+    if decision_id is not None:
+        print(f"\n🎮 {display} is inviting you to play Tic Tac Toe as {my_symbol}.")
+        print(f"Type 'accept {decision_id}' or 'reject {decision_id}'.")
+
 
 def handle_move(msg, addr):
     from_id = msg.get("FROM")
@@ -130,7 +146,7 @@ def send_result(result_str, winning_line=None):
     }
     peer = peers.get(game_state["opponent"])
     if peer:
-        send_udp(build_message(msg), peer["ADDRESS"])
+        send_game_message(msg, peer["ADDRESS"])
 
 
 def cli_game_invite():
@@ -166,7 +182,7 @@ def cli_game_invite():
         "TOKEN": token,
     }
 
-    send_udp(build_message(msg), peer["ADDRESS"])
+    send_game_message(msg, peer["ADDRESS"])
     print(f"📨 Invite sent. You play as {symbol}.")
 
 
@@ -209,7 +225,7 @@ def cli_game_move():
         "TOKEN": generate_token(local_profile["USER_ID"], ttl=3600, scope="game"),
     }
 
-    send_udp(build_message(msg), peer["ADDRESS"])
+    send_game_message(msg, peer["ADDRESS"])
     print(f"✅ Move sent ({game_state['symbol']} at {position}).")
     print_board()
 
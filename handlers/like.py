@@ -7,7 +7,8 @@ from utils import (
     generate_token,
 )
 from state import posts, local_profile, follow_map, liked_posts, peers
-from config import BROADCAST_ADDRESS, settings
+from config import BROADCAST_ADDRESS, DEFAULT_TTL, settings
+import event_log
 
 # ========== Colors ==========
 RED = "\033[91m"
@@ -65,7 +66,7 @@ def cli_send():
         print(f"{RED}❌ Invalid TIMESTAMP.{RESET}")
         return
 
-    post = posts.get(post_timestamp)
+    key, post = posts.find(post_timestamp)
     if not post:
         print(f"{RED}❌ No post found with that TIMESTAMP.{RESET}")
         return
@@ -76,17 +77,17 @@ def cli_send():
     ttl = 3600
     token = generate_token(sender, "broadcast", ttl, timestamp)
 
-    if action == "LIKE" and post_timestamp in liked_posts:
+    if action == "LIKE" and key in liked_posts:
         print(f"{YELLOW}⚠️ Already liked.{RESET}")
         return
-    elif action == "UNLIKE" and post_timestamp not in liked_posts:
+    elif action == "UNLIKE" and key not in liked_posts:
         print(f"{YELLOW}⚠️ Cannot unlike a post that was not liked.{RESET}")
         return
 
     if action == "LIKE":
-        liked_posts.add(post_timestamp)
+        liked_posts.add(key)
     else:
-        liked_posts.discard(post_timestamp)
+        liked_posts.discard(key)
 
     # === Get recipient address from peers ===
     peer_info = peers.get(target_user)
@@ -137,7 +138,9 @@ def handle_post(msg: dict):
             print(f"{YELLOW}⚠️ Invalid TIMESTAMP format.{RESET}")
         return
 
-    posts[timestamp] = msg
+    ttl = msg.get("TTL", "")
+    ttl = int(ttl) if ttl.isdigit() else DEFAULT_TTL
+    posts.add(user, timestamp, dict(msg), ttl)
     display = user.split("@")[0]
 
     if settings["VERBOSE"]:
@@ -159,30 +162,25 @@ def handle_like(msg: dict):
     token = msg.get("TOKEN", "")
 
     if action not in ["LIKE", "UNLIKE"] or not from_user or not to_user or not post_timestamp:
-        if settings["VERBOSE"]:
-            print(f"{YELLOW}⚠️ Malformed LIKE/UNLIKE message.{RESET}")
+        event_log.debug("LIKE_INVALID", reason="malformed", user=from_user)
         return
 
     try:
         post_timestamp = int(post_timestamp)
     except ValueError:
-        if settings["VERBOSE"]:
-            print(f"{YELLOW}⚠️ Invalid POST_TIMESTAMP format.{RESET}")
+        event_log.debug("LIKE_INVALID", reason="bad POST_TIMESTAMP", user=from_user)
         return
 
-    post = posts.get(post_timestamp)
-    if not post:
-        if settings["VERBOSE"]:
-            print(f"{YELLOW}💌 LIKE received for post timestamp: {post_timestamp}{RESET}")
+    if to_user != local_profile["USER_ID"]:
         return
 
-    if to_user != local_profile["USER_ID"]:
+    _, post = posts.find(post_timestamp, author=to_user)
+    if not post:
+        event_log.debug("LIKE_UNKNOWN_POST", user=from_user, post_timestamp=post_timestamp)
         return
 
     post_content = post.get("CONTENT", "")
     preview = post_content if len(post_content) <= 30 else post_content[:30] + "..."
 
-    if settings["VERBOSE"]:
-        print(f"{MAGENTA}🔔 {from_user} {action.lower()}d your post [{preview}]{RESET}")
-    else:
-        print(f"{MAGENTA}{from_user.split('@')[0]} {action.lower()}s your post [{preview}]{RESET}")
+    event_log.debug("LIKE_RECEIVED", user=from_user, action=action, post_timestamp=post_timestamp)
+    print(f"{MAGENTA}{from_user.split('@')[0]} {action.lower()}s your post [{preview}]{RESET}")
@@ -1,4 +1,4 @@
-from state import local_profile
+from state import local_profile, peers, posts
 from socket_handler import send_unicast, send_udp
 from message import build_message
 from config import settings, PING_INTERVAL, BROADCAST_ADDRESS
@@ -51,19 +51,33 @@ def handle(msg: dict, addr: tuple):
     if settings["VERBOSE"]:
         print(f"\n📤 Responded to PING with PROFILE to {addr[0]}\n")
 
+def ping_tick():
+    """One round of the periodic PING broadcast, plus expiry of silent peers and old posts."""
+    peers.expire()
+    posts.purge_expired()
+    if not local_profile.get("USER_ID"):
+        return
+
+    msg = build_ping()
+    if settings["VERBOSE"]:
+        print("📡 Broadcasting PING...")
+    send_udp(msg, BROADCAST_ADDRESS)
+
 # Auto PING loop (daemon thread)
 def auto_ping_loop():
     while True:
-        if not local_profile.get("USER_ID"):
-            time.sleep(PING_INTERVAL)
-            continue
-
-        msg = build_ping()
-        if settings["VERBOSE"]:
-            print("📡 Broadcasting PING...")
-        send_udp(msg, BROADCAST_ADDRESS)
+        ping_tick()
         time.sleep(PING_INTERVAL)
 
+# Auto PING timer (asyncio event loop, used by async_engine)
+def schedule_auto_ping(loop):
+    def tick():
+        try:
+            ping_tick()
+        finally:
+            loop.call_later(PING_INTERVAL, tick)
+    loop.call_soon(tick)
+
 def start_auto_ping():
     t = threading.Thread(target=auto_ping_loop, daemon=True)
     t.start()
@@ -7,7 +7,8 @@ from utils import (
     generate_token,
 )
 from state import posts, local_profile, follow_map, liked_posts, peers
-from config import BROADCAST_ADDRESS, settings
+from config import BROADCAST_ADDRESS, DEFAULT_TTL
+import event_log
 
 # ========== Colors ==========
 RED = "\033[91m"
@@ -39,11 +40,14 @@ def cli_send():
 
     send_udp(build_message(message), BROADCAST_ADDRESS)
 
-    posts[timestamp] = {
-        "message": message,
-        "from": local_profile["USER_ID"],
-        "timestamp": timestamp
-    }
+    posts.add(user_id, timestamp, {
+        "USER_ID": user_id,
+        "CONTENT": content,
+        "TTL": ttl,
+        "TIMESTAMP": timestamp,
+        "MESSAGE_ID": message["MESSAGE_ID"],
+        "TOKEN": token,
+    }, ttl)
 
     print(f"{GREEN}✅ POST broadcast sent.{RESET}")
 
@@ -62,7 +66,7 @@ def send_like():
         print(f"{RED}❌ Invalid TIMESTAMP.{RESET}")
         return
 
-    post = posts.get(post_timestamp)
+    key, post = posts.find(post_timestamp)
     if not post:
         print(f"{RED}❌ No post found with that TIMESTAMP.{RESET}")
         return
@@ -73,17 +77,17 @@ def send_like():
     ttl = 3600
     token = generate_token(sender, "broadcast", ttl, timestamp)
 
-    if action == "LIKE" and post_timestamp in liked_posts:
+    if action == "LIKE" and key in liked_posts:
         print(f"{YELLOW}⚠️ Already liked.{RESET}")
         return
-    elif action == "UNLIKE" and post_timestamp not in liked_posts:
+    elif action == "UNLIKE" and key not in liked_posts:
         print(f"{YELLOW}⚠️ Cannot unlike a post that was not liked.{RESET}")
         return
 
     if action == "LIKE":
-        liked_posts.add(post_timestamp)
+        liked_posts.add(key)
     else:
-        liked_posts.discard(post_timestamp)
+        liked_posts.discard(key)
 
     message = {
         "TYPE": "LIKE",
@@ -116,46 +120,40 @@ def handle_post(msg: dict):
     message_id = msg.get("MESSAGE_ID")
     token = msg.get("TOKEN")
 
-    # Inject timestamp at time of receipt
-    timestamp = int(time.time())
+    # Sender's TIMESTAMP identifies the post (LIKEs quote it); receipt time if missing
+    timestamp = msg.get("TIMESTAMP") or int(time.time())
 
     if not user or not content: #or not timestamp
-        if settings["VERBOSE"]:
-            print(user)
-            print(content)
-            print(f"{YELLOW}⚠️ Malformed POST received.{RESET}")
+        event_log.debug("POST_INVALID", reason="malformed", user=user)
         return
 
     try:
         timestamp = int(timestamp)
     except ValueError:
-        if settings["VERBOSE"]:
-            print(f"{YELLOW}⚠️ Invalid TIMESTAMP format.{RESET}")
+        event_log.debug("POST_INVALID", reason="bad TIMESTAMP", user=user)
+        return
+
+    ttl = int(ttl) if ttl and str(ttl).isdigit() else DEFAULT_TTL
+    if timestamp + ttl <= time.time():
+        event_log.debug("POST_EXPIRED", user=user, timestamp=timestamp)
         return
 
-    posts[timestamp] = {
+    posts.add(user, timestamp, {
         "USER_ID": user,
         "CONTENT": content,
-        "TTL": int(ttl),
+        "TTL": ttl,
         "TIMESTAMP": timestamp,
+        "MESSAGE_ID": message_id,
         "TOKEN": token,
-    }
+    }, ttl)
     display = user.split("@")[0]
  # Print post
     name = peers.get(user, {}).get("DISPLAY_NAME", user)
     avatar = peers.get(user, {}).get("AVATAR", "")
 
-    if settings["VERBOSE"]:
-        print(f"\n{BLUE}[POST]{RESET} From: {user}")
-        print(f"{CYAN}DISPLAY_NAME:{RESET} {name}")
-        print(f"{CYAN}CONTENT:{RESET} {content}")
-        print(f"{CYAN}TTL:{RESET} {ttl}")
-        print(f"{CYAN}MESSAGE_ID:{RESET} {message_id}")
-        print(f"{CYAN}TOKEN:{RESET} {token}")
-        print(f"{CYAN}TIMESTAMP:{RESET} {timestamp}")
-    else:
-        display = f"{name}: {content}"
-        print(f"{avatar} {display}" if avatar else display)
+    event_log.debug("POST_RECEIVED", user=user, id=message_id, ttl=ttl, timestamp=timestamp)
+    display = f"{name}: {content}"
+    print(f"{avatar} {display}" if avatar else display)
 
 
 def handle_like(msg: dict):
@@ -170,31 +168,25 @@ def handle_like(msg: dict):
     token = msg.get("TOKEN", "")
 
     if action not in ["LIKE", "UNLIKE"] or not from_user or not to_user or not post_timestamp:
-        if settings["VERBOSE"]:
-            print(f"{YELLOW}⚠️ Malformed LIKE/UNLIKE message.{RESET}")
+        event_log.debug("LIKE_INVALID", reason="malformed", user=from_user)
         return
 
     try:
         post_timestamp = int(post_timestamp)
     except ValueError:
-        if settings["VERBOSE"]:
-            print(f"{YELLOW}⚠️ Invalid POST_TIMESTAMP format.{RESET}")
+        event_log.debug("LIKE_INVALID", reason="bad POST_TIMESTAMP", user=from_user)
         return
 
-    post = posts.get(post_timestamp)
-    if not post:
-        if settings["VERBOSE"]:
-            print(f"{YELLOW}⚠️ LIKE received for unknown post timestamp: {post_timestamp}{RESET}")
+    if to_user != local_profile["USER_ID"]:
         return
 
-    if to_user != local_profile["USER_ID"]:
+    _, post = posts.find(post_timestamp, author=to_user)
+    if not post:
+        event_log.debug("LIKE_UNKNOWN_POST", user=from_user, post_timestamp=post_timestamp)
         return
 
     post_content = post.get("CONTENT", "")
     preview = post_content if len(post_content) <= 30 else post_content[:30] + "..."
 
-    if settings["VERBOSE"]:
-        print(post)
-        print(f"{MAGENTA}🔔 {from_user} {action.lower()}d your post [{preview}]{RESET}")
-    else:
-        print(f"{MAGENTA}{from_user.split('@')[0]} {action.lower()}s your post [{preview}]{RESET}")
+    event_log.debug("LIKE_RECEIVED", user=from_user, action=action, post_timestamp=post_timestamp)
+    print(f"{MAGENTA}{from_user.split('@')[0]} {action.lower()}s your post [{preview}]{RESET}")
@@ -8,6 +8,7 @@ from socket_handler import send_udp
 from utils import generate_message_id, current_unix_timestamp
 from state import peers, local_profile, get_peer_address
 from config import BROADCAST_ADDRESS, MAX_IMAGE_SIZE, settings
+import event_log
 
 # ========== Color Constants ==========
 RED = "\033[91m"
@@ -94,9 +95,7 @@ def handle(msg: dict, addr: tuple):
     sender_user_id = msg.get("USER_ID", "").strip()
 
     if not all(field in msg for field in REQUIRED_FIELDS):
-        if settings["VERBOSE"]:
-            # print(msg)
-            print(f"{YELLOW}⚠️  Malformed PROFILE received (missing fields).{RESET}")
+        event_log.debug("PROFILE_INVALID", reason="missing fields", src=ip)
         return
 
     # Extract username from sender USER_ID and from our own local_profile
@@ -104,15 +103,11 @@ def handle(msg: dict, addr: tuple):
         sender_username = sender_user_id.split("@")[0].lower()
         local_username = local_profile["USER_ID"].split("@")[0].lower()
     except Exception:
-        if settings["VERBOSE"]:
-            # print(msg)
-            print(f"{YELLOW}⚠️  Malformed USER_ID in PROFILE.{RESET}")
+        event_log.debug("PROFILE_INVALID", reason="malformed USER_ID", src=ip)
         return
 
     # Ignore if same username (regardless of IP/interface)
     if sender_username == local_username:
-        if settings["VERBOSE"]:
-            print(f"{BLUE}ℹ️  Ignoring self profile broadcast.{RESET}")
         return
 
     # Save peer info using the full USER_ID
@@ -128,22 +123,10 @@ def handle(msg: dict, addr: tuple):
     if "AVATAR_DATA" in msg:
         peers[sender_user_id]["AVATAR_TYPE"] = msg.get("AVATAR_TYPE", "image/png")
 
-    avatar_data = msg.get("AVATAR_DATA", "")
-    avatar_preview = avatar_data[:30] + ("..." if len(avatar_data) > 30 else "")
-    avatar_size = len(avatar_data.encode("utf-8"))
-
-
-    if settings["VERBOSE"]:
-        print(f"\n{CYAN}📥 PROFILE received from {sender_user_id}{RESET}")
-        print(f"  {BLUE}TYPE:{RESET} {msg.get('TYPE', '')}")
-        print(f"  {BLUE}USER_ID:{RESET} {msg.get('USER_ID', '')}")
-        print(f"  {BLUE}DISPLAY_NAME:{RESET} {msg.get('DISPLAY_NAME', '')}")
-        print(f"  {BLUE}STATUS:{RESET} {msg.get('STATUS', '')}")
-        print(f"  {BLUE}AVATAR_TYPE:{RESET} {msg.get('AVATAR_TYPE', '')}")
-        print(f"  {BLUE}AVATAR_ENCODING:{RESET} {msg.get('AVATAR_ENCODING', '')}")
-        print(f"  {BLUE}AVATAR_DATA:{RESET} \"{avatar_preview}\" ({avatar_size} bytes)")
-    else:
-        print(f"{CYAN}👤 {msg.get('NAME', '')}:{RESET} {msg.get('STATUS', '')}")
+    event_log.debug("PROFILE_RECEIVED", user=sender_user_id, display_name=msg.get("DISPLAY_NAME", ""),
+                    status=msg.get("STATUS", ""), avatar_type=msg.get("AVATAR_TYPE", ""),
+                    avatar_bytes=len(msg.get("AVATAR_DATA", "")))
+    print(f"{CYAN}👤 {msg.get('DISPLAY_NAME', '')}:{RESET} {msg.get('STATUS', '')}")
 
 # ========== Send ==========
 def cli_send():
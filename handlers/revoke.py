@@ -1,15 +1,28 @@
 from message import build_message
 from socket_handler import send_udp
-from config import BROADCAST_ADDRESS, PORT
-from state import revoked_tokens, tokens, local_profile
+from config import BROADCAST_ADDRESS, PORT, MTU, IP_UDP_HEADER
+from state import tokens, local_profile
+from token_registry import registry, token_hash
+import event_log
 
 def handle(msg: dict, addr: tuple):
     token = msg.get("TOKEN")
     if token:
-        revoked_tokens.add(token)
+        registry.revoke(token)
         if token in tokens:
             del tokens[token]
 
+def handle_batch(msg: dict, addr: tuple):
+    # TOKEN_HASHES: comma-separated SHA-256 hashes, applied in one pass.
+    # A peer may only revoke its own tokens, and USER_ID must match the sender's IP.
+    user_id = msg.get("USER_ID", "")
+    if user_id.rpartition("@")[2] != addr[0]:
+        event_log.debug("REVOKE_BATCH_REJECTED", user=user_id, src=addr[0])
+        return
+    hashes = [h for h in msg.get("TOKEN_HASHES", "").split(",") if h]
+    for token in registry.revoke_hashes(hashes, issuer=user_id):
+        tokens.pop(token, None)
+
 def send_revoke(token: str):
 
     message_str = build_message({
@@ -21,12 +34,35 @@ def send_revoke(token: str):
     send_udp(message_str, BROADCAST_ADDRESS, PORT)
 
     # Mark as revoked locally
-    revoked_tokens.add(token)
+    registry.revoke(token)
     if token in tokens:
         del tokens[token]
 
+def build_revoke_batches(user_id: str, hashes: list) -> list:
+    """REVOKE_BATCH messages carrying as many hashes as fit in one datagram each."""
+    base = len(build_message({"TYPE": "REVOKE_BATCH", "USER_ID": user_id, "TOKEN_HASHES": ""}).encode())
+    budget = MTU - IP_UDP_HEADER - base
+
+    messages, batch, size = [], [], 0
+    for h in hashes:
+        if batch and size + 1 + len(h) > budget:
+            messages.append(build_message({"TYPE": "REVOKE_BATCH", "USER_ID": user_id, "TOKEN_HASHES": ",".join(batch)}))
+            batch, size = [], 0
+        size += len(h) + (1 if batch else 0)
+        batch.append(h)
+    if batch:
+        messages.append(build_message({"TYPE": "REVOKE_BATCH", "USER_ID": user_id, "TOKEN_HASHES": ",".join(batch)}))
+    return messages
+
+def send_revoke_batch(user_id: str, revoked: list):
+    """Revokes tokens locally and broadcasts them in as few datagrams as fit."""
+    hashes = [token_hash(token) for token in revoked]
+    registry.revoke_hashes(hashes)
+    for token in revoked:
+        tokens.pop(token, None)
+    for message in build_revoke_batches(user_id, hashes):
+        send_udp(message, BROADCAST_ADDRESS, PORT)
+
 def revoke_all_tokens_by_user():
     user_id = local_profile["USER_ID"]
-    for token in list(tokens.keys()):
-        if token.startswith(user_id + "|"):
-            send_revoke(token)
\ No newline at end of file
+    send_revoke_batch(user_id, registry.tokens_by(user_id))
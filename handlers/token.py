@@ -2,7 +2,9 @@ import time
 from message import build_message
 from socket_handler import send_unicast, send_udp
 from utils import generate_message_id, current_unix_timestamp
-from state import tokens, revoked_tokens, peers, local_profile
+from state import tokens, peers, local_profile
+from token_registry import registry
+from handlers.revoke import send_revoke_batch
 from config import BROADCAST_ADDRESS, PORT
 
 # Constants
@@ -44,26 +46,18 @@ def handle_revoke(msg: dict, addr: tuple = None):
     token = msg.get("TOKEN")
     if not token:
         return
-    revoked_tokens.add(token)
+    registry.revoke(token)
     if token in tokens:
         del tokens[token]
     # Per RFC: DO NOT print anything in non-verbose mode
 
 # ========== Broadcast Revoke ==========
 def revoke_all_tokens_by_user(user_id: str):
-    for token in list(tokens.keys()):
-        if token.startswith(f"{user_id}|"):
-            revoke_token(token)
-            revoked_tokens.add(token)
-            del tokens[token]
+    send_revoke_batch(user_id, registry.tokens_by(user_id))
 
 def send_revoke_for_all_tokens(sock):
     user_id = local_profile["USER_ID"]
-    for token in list(tokens.keys()):
-        if token.startswith(user_id):
-            revoke_msg = f"TYPE: REVOKE\nTOKEN: {token}"
-            send_udp(revoke_msg, BROADCAST_ADDRESS, PORT)
-            del tokens[token]  # Remove locally too
+    send_revoke_batch(user_id, registry.tokens_by(user_id))
 
 def revoke_token(token: str):
     msg = build_message({
@@ -71,3 +65,4 @@ def revoke_token(token: str):
         "TOKEN": token
     })
     send_udp(msg, BROADCAST_ADDRESS, PORT)
+    registry.revoke(token)
@@ -1,9 +1,13 @@
+import asyncio
+import inspect
+import sys
 import threading
-from socket_handler import create_socket, receive_udp
+from socket_handler import create_socket, ReceiveRing, receive_batch, close_send_sockets
 from message import parse_message
-from state import seen_message_ids
-from utils import current_unix_timestamp
-from config import settings
+from state import seen_message_ids, peers
+from dedup import message_key
+from token_registry import registry as token_registry
+from config import settings, RELIABLE_TYPES
 from handlers import (
     ack,
     profile,
@@ -22,9 +26,17 @@ from file_transfer.receiver import (
     handle_file_offer, 
     handle_file_chunk, 
     handle_file_received, 
-    handle_file_accept
+    handle_binary_chunk,
 )
+from file_transfer import framing
+from file_transfer.sender import handle_file_accept, handle_chunk_ack, handle_nack
 from handlers.token import revoke_token, revoke_all_tokens_by_user
+import async_engine
+import decisions
+import dispatcher
+import reliability
+import event_log
+import sharding
 
 def log(msg: str):
     if settings["VERBOSE"]:
@@ -32,76 +44,130 @@ def log(msg: str):
 
 def toggle_verbose():
     settings["VERBOSE"] = not settings["VERBOSE"]
+    event_log.set_verbose(settings["VERBOSE"])
     print(f"{'🔊 Verbose ON' if settings['VERBOSE'] else '🔈 Verbose OFF'}")
 
+def is_duplicate(msg: dict, addr: tuple) -> bool:
+    """Returns True if msg was already seen, recording its ID otherwise."""
+    key = message_key(msg, addr)
+    return key is not None and seen_message_ids.check_and_add(key)
+
+def needs_reack(msg: dict) -> bool:
+    """A repeat of msg must still reach dispatch_message, which re-ACKs it."""
+    msg_type = msg.get("TYPE", "").upper()
+    return msg_type in RELIABLE_TYPES and "MESSAGE_ID" in msg
+
+def worker_drops(msg: dict, addr: tuple) -> bool:
+    """Receive workers drop repeats early, except those the coordinator re-ACKs."""
+    return is_duplicate(msg, addr) and not needs_reack(msg)
+
 def dispatch_message(msg: dict, addr: tuple, sock):
     msg_type = msg.get("TYPE", "").upper()
 
-    if settings["VERBOSE"]:
-        print(f"[{current_unix_timestamp()}] < {addr[0]}:{addr[1]} | TYPE: {msg_type}")
+    if event_log.enabled(event_log.DEBUG) and event_log.sampled(event_log.DEBUG, "RECV " + msg_type):
+        # Type, ID and size only: copying the whole message would undo the lazy parse
+        event_log.record(event_log.DEBUG, "RECV " + msg_type, src=f"{addr[0]}:{addr[1]}",
+                         id=msg.get("MESSAGE_ID"), size=getattr(msg, "nbytes", None))
+
+    peers.touch_address(addr[0])
+    needs_ack = msg_type in RELIABLE_TYPES and "MESSAGE_ID" in msg
 
-    msg_id = msg.get("ID")
-    if msg_id and msg_id in seen_message_ids:
+    if is_duplicate(msg, addr):
+        event_log.debug("DUPLICATE", type=msg_type, src=addr[0])
+        if needs_ack:
+            # The sender retransmitted, so our first ACK was probably lost
+            ack.send_ack_to(addr[0], msg["MESSAGE_ID"], force=True)
         return
-    if msg_id:
-        seen_message_ids.add(msg_id)
-
-    if msg_type == "ACK":
-        ack.handle(msg, addr)
-    elif msg_type == "PROFILE":
-        profile.handle(msg, addr)
-    elif msg_type == "POST":
-        post.handle(msg, addr)
-    elif msg_type == "LIKE":
-        like.handle(msg, addr)
-    elif msg_type == "DM":
-        dm.handle(msg, addr)
-    elif msg_type == "PING":
-        ping.handle(msg, addr)
-    elif msg_type == "FILE_OFFER":
-        handle_file_offer(msg)
-    elif msg_type == "FILE_CHUNK":
-        handle_file_chunk(msg)
-    elif msg_type == "FILE_RECEIVED":
-        handle_file_received(msg)
-    elif msg_type == "FILE_ACCEPT":
-        handle_file_accept(msg)
-    elif msg_type.startswith("GROUP"):
-        group.handle(msg, addr)
-    elif msg_type.startswith("GAME"):
-        game.handle(msg, addr)
-    elif msg_type == "TICTACTOE_INVITE":
-        game.handle_invite(msg, addr)
-    elif msg_type == "TICTACTOE_MOVE":
-        game.handle_move(msg, addr)
-    elif msg_type == "TICTACTOE_RESULT":
-        game.handle_result(msg, addr)
-     #elif msg_type == "GAME_QUIT":
-        #handle_game_quit(msg, addr)
-    elif msg_type == "TOKEN":
-        token.handle(msg, addr)
-    elif msg_type == "REVOKE":
-        revoke.handle(msg, addr)
-    elif msg_type == "FOLLOW":
-        follow.handle(msg, addr)
-    elif msg_type == "UNFOLLOW":
-        follow.handle(msg, addr)
-    else:
-        if settings["VERBOSE"]:
-            print(f"⚠️  Unknown message type: {msg_type}")
-    
+
+    route = dispatcher.resolve(msg_type)
+    if route is None:
+        event_log.debug("UNKNOWN_TYPE", type=msg_type, src=addr[0])
+        return
+    result = route(msg, addr)
+    if needs_ack:
+        ack.send_ack_to(addr[0], msg["MESSAGE_ID"])
+    return result
+
+def register_routes():
+    """Registers the built-in LSNP message types with the dispatcher."""
+    dispatcher.register("ACK", ack.handle)
+    dispatcher.register("PROFILE", profile.handle)
+    dispatcher.register("POST", lambda msg, addr: post.handle_post(msg))
+    dispatcher.register("LIKE", lambda msg, addr: like.handle_like(msg))
+    dispatcher.register("DM", dm.handle)
+    dispatcher.register("PING", ping.handle)
+    dispatcher.register("FILE_OFFER", lambda msg, addr: handle_file_offer(msg))
+    dispatcher.register("FILE_CHUNK", lambda msg, addr: handle_file_chunk(msg))
+    dispatcher.register("FILE_RECEIVED", lambda msg, addr: handle_file_received(msg))
+    dispatcher.register("FILE_ACCEPT", lambda msg, addr: handle_file_accept(msg))
+    dispatcher.register("FILE_CHUNK_ACK", lambda msg, addr: handle_chunk_ack(msg))
+    dispatcher.register("FILE_NACK", lambda msg, addr: handle_nack(msg))
+    dispatcher.register("GROUP", group.handle, prefix=True)
+    dispatcher.register("GAME", game.handle, prefix=True)
+    dispatcher.register("TICTACTOE_INVITE", game.handle_invite)
+    dispatcher.register("TICTACTOE_MOVE", game.handle_move)
+    dispatcher.register("TICTACTOE_RESULT", game.handle_result)
+    dispatcher.register("TOKEN", token.handle)
+    dispatcher.register("REVOKE", revoke.handle)
+    dispatcher.register("REVOKE_BATCH", revoke.handle_batch)
+    dispatcher.register("FOLLOW", follow.handle)
+    dispatcher.register("UNFOLLOW", follow.handle)
+
+register_routes()
+
+def print_route_stats():
+    print(f"{'ROUTE':<20}{'CALLS':>8}{'ERRORS':>8}{'AVG_MS':>10}{'MAX_MS':>10}")
+    for row in dispatcher.route_stats():
+        print(f"{row['ROUTE']:<20}{row['CALLS']:>8}{row['ERRORS']:>8}{row['AVG_MS']:>10.3f}{row['MAX_MS']:>10.3f}")
+
+    print("\nReliable delivery:")
+    for key, value in reliability.stats.items():
+        print(f"  {key}: {value}")
+
+    print("\nEvent log:")
+    for key, value in event_log.stats().items():
+        print(f"  {key}: {value}")
+
+    print("\nDuplicate suppression:")
+    for key, value in seen_message_ids.stats().items():
+        print(f"  {key}: {value:.6f}" if isinstance(value, float) else f"  {key}: {value}")
+
+    print("\nTokens:")
+    for key, value in token_registry.stats().items():
+        print(f"  {key}: {value}")
+
+def process_datagram(data, addr: tuple, sock):
+    """Parses one raw datagram and runs it through dispatch_message."""
+    if framing.is_frame(data):
+        return handle_binary_chunk(data, addr)
+    return dispatch_message(parse_message(data), addr, sock)
+
+def run_result(result):
+    if inspect.isawaitable(result):
+        # async-aware handler outside the event loop: run it to completion
+        asyncio.run(result)
+
 def receive_loop():
     sock = create_socket()
+    ring = ReceiveRing()
     while True:
         try:
-            data, addr = receive_udp(sock)
-            if settings["VERBOSE"] : print("\n============== Raw Incoming ===============\n", data)
-            msg = parse_message(data)
-            if settings["VERBOSE"] : print("============== Parsed Message ==============\n", msg)
-            dispatch_message(msg, addr, sock)
+            batch = receive_batch(sock, ring)
         except Exception as e:
-            if settings["VERBOSE"]:
-                print(f"❌ Receive error: {e}")
+            event_log.debug("RECV_ERROR", error=e)
+            continue
+
+        for data, addr in batch:
+            try:
+                run_result(process_datagram(data, addr, sock))
+            except Exception as e:
+                event_log.debug("RECV_ERROR", error=e, src=addr[0])
+
+def dispatch_sharded(msg, addr: tuple):
+    """Coordinator side of sharded receive: state is only touched here."""
+    if isinstance(msg, bytes):  # binary FILE_CHUNK frame, passed through unparsed
+        return handle_binary_chunk(msg, addr)
+    run_result(dispatch_message(msg, addr, None))
 
 def cli_loop():
     print("🎛️  LSNP CLI Ready. Type 'help' for commands.")
@@ -110,8 +176,6 @@ def cli_loop():
             cmd = input("LSNP> ").strip()
             if cmd == "exit":
                 try:
-                    sock = create_socket()
-                    # revoke_token(sock)
                     revoke.revoke_all_tokens_by_user()
                 except Exception as e:
                     print(f"⚠️  Error sending REVOKE: {e}")
@@ -125,11 +189,15 @@ Available Commands:
 - dm          Send a direct message
 - follow      Follow a user
 - file        Send a FILE_OFFER
+- pending     List file offers and game invites waiting for an answer
+- accept <n>  Accept pending offer/invite n
+- reject <n>  Decline pending offer/invite n
 - group       Manage groups (create, join, leave)
 - game        Play Tic Tac Toe (invite, move, quit)
 - revoke      Revoke a token
 - unfollow    Unfollow a user
 - verbose     Toggle verbose mode
+- stats       Show handler, delivery and duplicate-suppression stats
 - exit        Quit the program
                 """)
             elif cmd == "profile":
@@ -144,6 +212,11 @@ Available Commands:
                 ping.cli_send()
             elif cmd == "file":
                 cli.file_transfer_cli()
+            elif cmd == "pending":
+                decisions.cli_pending()
+            elif cmd.split(" ", 1)[0] in ("accept", "reject"):
+                action, _, arg = cmd.partition(" ")
+                decisions.cli_resolve(arg, accept=action == "accept")
             elif cmd == "group":
                 print("""
                                 Group Commands:
@@ -209,11 +282,12 @@ Available Commands:
                 print("✅ Token revoked.")
             elif cmd == "verbose":
                 toggle_verbose()
+            elif cmd == "stats":
+                print_route_stats()
             else:
                 print("❓ Unknown command. Try 'help'.")
         except KeyboardInterrupt:
             try:
-                sock = create_socket()
                 revoke.revoke_all_tokens_by_user()
             except Exception as e:
                 print(f"⚠️  Error sending REVOKE: {e}")
@@ -223,6 +297,13 @@ Available Commands:
 
 if __name__ == "__main__":
     from state import local_profile
+    if "--async" in sys.argv:
+        settings["ASYNC_ENGINE"] = True
+    for arg in sys.argv:
+        if arg.startswith("--workers="):
+            settings["RECV_WORKERS"] = int(arg.split("=", 1)[1])
+        elif arg.startswith("--log-file="):
+            settings["LOG_FILE"] = arg.split("=", 1)[1]
     # from utils import get_local_ip  # if you modularize this later
 
     username = input("Enter your LSNP username: ").strip()
@@ -230,7 +311,17 @@ if __name__ == "__main__":
     local_profile["USER_ID"] = f"{username}@{local_profile['LOCAL_IP']}"
 
     print(f"Logging in as {username}@{local_profile['LOCAL_IP']}\n")
-    threading.Thread(target=receive_loop, daemon=True).start()
-    ping.start_auto_ping()
+    if settings["RECV_WORKERS"] > 1:
+        # Fork the workers before any other thread exists
+        sharding.start_workers(settings["RECV_WORKERS"], worker_drops, dispatch_sharded)
+    if settings["ASYNC_ENGINE"]:
+        # Receive and the periodic timers run on one asyncio event loop
+        threading.Thread(target=async_engine.run, args=(process_datagram, ping.schedule_auto_ping),
+                         daemon=True).start()
+    else:
+        threading.Thread(target=receive_loop, daemon=True).start()
+        ping.start_auto_ping()
     print("Please set up your profile first!")
-    cli_loop()
\ No newline at end of file
+    cli_loop()
+    event_log.flush()
+    close_send_sockets()
\ No newline at end of file
@@ -1,11 +1,136 @@
-def parse_message(data: str) -> dict:
-    lines = data.strip().splitlines()
-    msg = {}
-    for line in lines:
-        if ": " in line:
-            key, val = line.split(": ", 1)
-            msg[key.strip()] = val.strip()
-    return msg
+import re
+from config import BUFFER_SIZE
+from collections.abc import Mapping
+
+# One "KEY: VALUE" line. Works directly on bytes, bytearray or memoryview.
+_FIELD = re.compile(rb"^[ \t]*([^:\r\n]+?)[ \t]*: [ \t]*([^\r\n]*?)[ \t]*\r?$", re.MULTILINE)
+
+class LazyMessage(Mapping):
+    """
+    Read-only view of one LSNP message over its raw bytes.
+
+    Lines are only scanned as far as needed to find the requested key, so
+    reading TYPE or ID first costs a partial scan and no decoding. Values are
+    decoded on first access and cached. raw() returns a zero-copy memoryview
+    of a value, meant for large fields like DATA and AVATAR_DATA.
+
+    When built over a receive buffer, the message is only valid until that
+    buffer is reused; call dict(msg) to keep a copy.
+    """
+    __slots__ = ("_buf", "_scan", "_spans", "_values")
+
+    def __init__(self, data):
+        self._buf = memoryview(data)
+        self._scan = _FIELD.finditer(self._buf)
+        self._spans = {}   # key → (start, end) of the value in _buf
+        self._values = {}  # key → decoded value
+
+    def _find(self, key):
+        span = self._spans.get(key)
+        if span is not None or self._scan is None:
+            return span
+        for match in self._scan:
+            found = str(match.group(1), 'utf-8')
+            self._spans.setdefault(found, match.span(2))
+            if found == key:
+                return self._spans[key]
+        self._scan = None
+        return None
+
+    def _scan_all(self):
+        if self._scan is not None:
+            self._find(None)
+
+    @property
+    def nbytes(self) -> int:
+        """Size of the raw message."""
+        return len(self._buf)
+
+    def raw(self, key, default=None):
+        """Zero-copy memoryview of a field's value."""
+        span = self._find(key)
+        if span is None:
+            return default
+        return self._buf[span[0]:span[1]]
+
+    def __getitem__(self, key):
+        try:
+            return self._values[key]
+        except KeyError:
+            pass
+        span = self._find(key)
+        if span is None:
+            raise KeyError(key)
+        value = str(self._buf[span[0]:span[1]], 'utf-8')
+        self._values[key] = value
+        return value
+
+    def __contains__(self, key):
+        return self._find(key) is not None
+
+    def __iter__(self):
+        self._scan_all()
+        return iter(self._spans)
+
+    def __len__(self):
+        self._scan_all()
+        return len(self._spans)
+
+    def __repr__(self):
+        return repr(dict(self))
+
+def raw_field(msg, key: str):
+    """Bytes-like value of a field, zero-copy when msg is a LazyMessage."""
+    if isinstance(msg, LazyMessage):
+        return msg.raw(key)
+    value = msg.get(key)
+    return value.encode('utf-8') if isinstance(value, str) else value
+
+def parse_message(data) -> LazyMessage:
+    # Accepts text or any bytes-like object (e.g. a memoryview into a receive buffer)
+    if isinstance(data, str):
+        data = data.encode('utf-8')
+    return LazyMessage(data)
 
 def build_message(fields: dict) -> str:
     return "\n".join(f"{k}: {v}" for k, v in fields.items()) + "\n\n"
+
+class MessageTemplate:
+    """
+    Precompiled serializer for a message whose header fields don't change
+    (e.g. every FILE_CHUNK of one transfer). The fixed fields are encoded once;
+    render() splices the varying fields in after them, in the order given at
+    construction, writing into a reusable preallocated buffer.
+
+    The returned memoryview is only valid until the next render() call.
+    """
+
+    def __init__(self, fixed: dict, varying, size: int = BUFFER_SIZE):
+        self._header = "".join(f"{k}: {v}\n" for k, v in fixed.items()).encode('utf-8')
+        self._keys = [f"{k}: ".encode('utf-8') for k in varying]
+        self._view = memoryview(bytearray(size))
+        self._view[:len(self._header)] = self._header
+        self._header_len = len(self._header)
+
+    def render(self, *values) -> memoryview:
+        return self._render(self._view, values)
+
+    def render_into(self, buffer, *values) -> memoryview:
+        """render() into a caller's buffer, so several rendered messages can be alive at once."""
+        view = memoryview(buffer)
+        view[:self._header_len] = self._header
+        return self._render(view, values)
+
+    def _render(self, view: memoryview, values) -> memoryview:
+        pos = self._header_len
+        for key, value in zip(self._keys, values):
+            if not isinstance(value, (bytes, bytearray, memoryview)):
+                value = str(value).encode('utf-8')
+            end = pos + len(key)
+            view[pos:end] = key
+            pos = end + len(value)
+            view[end:pos] = value
+            view[pos] = 10  # "\n"
+            pos += 1
+        view[pos] = 10  # blank line terminator
+        return view[:pos + 1]
@@ -0,0 +1,167 @@
+import threading
+import time
+from collections import OrderedDict
+import event_log
+from config import PING_INTERVAL, PEER_EXPIRY_PINGS, MAX_PEERS
+
+# ========== Peer Directory ==========
+
+class PeerDirectory(dict):
+    """
+    Known peers, USER_ID → info dict (as stored by profile.handle), with
+    secondary indexes kept in step on every write so lookups by username or
+    by IP address are a single dict hit instead of a scan over all peers.
+
+    It is still a dict, so existing code that reads peers.get(), peers[uid]
+    or iterates peers.items() keeps working unchanged.
+
+    Liveness: any inbound traffic from a peer's IP refreshes its last-seen
+    time (touch_address). expire() drops peers silent for `ttl` seconds, and
+    once max_peers is reached the least recently seen peer is evicted.
+    on_join / on_leave listeners are called with (user_id, info[, reason]).
+    """
+
+    def __init__(self, ttl: float = PEER_EXPIRY_PINGS * PING_INTERVAL, max_peers: int = MAX_PEERS):
+        super().__init__()
+        self.ttl = ttl
+        self.max_peers = max_peers
+        self._by_username = {}  # lowercase username → USER_ID
+        self._by_address = {}   # IP → USER_ID
+        self._last_seen = OrderedDict()  # USER_ID → monotonic time, least recent first
+        self._lock = threading.RLock()
+        self.on_join = []
+        self.on_leave = []
+
+    @staticmethod
+    def _username(user_id: str) -> str:
+        return user_id.split("@")[0].lower()
+
+    def _index(self, user_id: str, info: dict):
+        self._by_username[self._username(user_id)] = user_id
+        address = info.get("ADDRESS") if isinstance(info, dict) else None
+        if address:
+            self._by_address[address] = user_id
+
+    def _unindex(self, user_id: str):
+        info = dict.get(self, user_id)
+        if info is None:
+            return
+        username = self._username(user_id)
+        if self._by_username.get(username) == user_id:
+            del self._by_username[username]
+        address = info.get("ADDRESS") if isinstance(info, dict) else None
+        if address and self._by_address.get(address) == user_id:
+            del self._by_address[address]
+
+    # ===== dict writes, all routed through the indexes =====
+    def __setitem__(self, user_id, info):
+        with self._lock:
+            joined = user_id not in self
+            self._unindex(user_id)
+            super().__setitem__(user_id, info)
+            self._index(user_id, info)
+            self._touch(user_id)
+            evicted = []
+            while len(self) > self.max_peers:
+                oldest = next(iter(self._last_seen))
+                evicted.append((oldest, self._remove(oldest)))
+        if joined:
+            self._notify(self.on_join, user_id, info)
+        for old_id, old_info in evicted:
+            self._notify(self.on_leave, old_id, old_info, "evicted")
+
+    def _remove(self, user_id):
+        self._unindex(user_id)
+        self._last_seen.pop(user_id, None)
+        return super().pop(user_id)
+
+    def __delitem__(self, user_id):
+        with self._lock:
+            self._remove(user_id)
+
+    def pop(self, user_id, *default):
+        with self._lock:
+            if user_id not in self:
+                return super().pop(user_id, *default)
+            return self._remove(user_id)
+
+    def popitem(self):
+        if not self:
+            raise KeyError("popitem(): peer directory is empty")
+        user_id = next(reversed(self))
+        return user_id, self.pop(user_id)
+
+    def setdefault(self, user_id, default=None):
+        if user_id not in self:
+            self[user_id] = default
+        return self[user_id]
+
+    def update(self, *args, **kwargs):
+        for user_id, info in dict(*args, **kwargs).items():
+            self[user_id] = info
+
+    def clear(self):
+        with self._lock:
+            super().clear()
+            self._by_username.clear()
+            self._by_address.clear()
+            self._last_seen.clear()
+
+    # ===== liveness =====
+    def _touch(self, user_id):
+        self._last_seen[user_id] = time.monotonic()
+        self._last_seen.move_to_end(user_id)
+
+    def touch_address(self, ip: str):
+        """Records inbound traffic from ip (called for every datagram)."""
+        user_id = self._by_address.get(ip)
+        if user_id is not None:
+            with self._lock:
+                if user_id in self._last_seen:
+                    self._touch(user_id)
+
+    def last_seen(self, user_id: str):
+        """Seconds since user_id was last heard from, or None if unknown."""
+        seen = self._last_seen.get(user_id)
+        return None if seen is None else time.monotonic() - seen
+
+    def expire(self) -> list:
+        """Drops peers not heard from within ttl. Returns the expired USER_IDs."""
+        cutoff = time.monotonic() - self.ttl
+        expired = []
+        with self._lock:
+            while self._last_seen:
+                user_id, seen = next(iter(self._last_seen.items()))
+                if seen >= cutoff:
+                    break
+                expired.append((user_id, self._remove(user_id)))
+        for user_id, info in expired:
+            self._notify(self.on_leave, user_id, info, "expired")
+        return [user_id for user_id, _ in expired]
+
+    def _notify(self, listeners, user_id, info, *reason):
+        fields = {"user": user_id, "address": info.get("ADDRESS")}
+        if reason:
+            fields["reason"] = reason[0]
+        event_log.debug("PEER_JOIN" if listeners is self.on_join else "PEER_LEAVE", **fields)
+        for listener in listeners:
+            try:
+                listener(user_id, info, *reason)
+            except Exception as e:
+                event_log.debug("PEER_LISTENER_ERROR", user=user_id, error=e)
+
+    # ===== lookups =====
+    def find_by_username(self, username: str):
+        """USER_ID of the peer with this username (case-insensitive), or None."""
+        return self._by_username.get(username.split("@")[0].lower())
+
+    def find_by_address(self, ip: str):
+        """USER_ID of the peer last seen at this IP, or None."""
+        return self._by_address.get(ip)
+
+    def address_of(self, user_id: str):
+        """IP of the peer with user_id's username, or None."""
+        match = self.find_by_username(user_id)
+        if match is None:
+            return None
+        return dict.__getitem__(self, match).get("ADDRESS")
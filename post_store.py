@@ -0,0 +1,135 @@
+import heapq
+import threading
+import time
+from config import DEFAULT_TTL, MAX_POSTS
+
+# ========== Post Store ==========
+
+class PostStore:
+    """
+    Posts keyed by (USER_ID, TIMESTAMP), so two authors posting in the same
+    second no longer overwrite each other, with secondary indexes by
+    MESSAGE_ID, by author and by timestamp.
+
+    TTL is enforced: each post's expiry time goes into a min-heap and
+    purge_expired() pops only what has expired, O(log n) per post. Every add
+    and lookup purges first, and beyond max_posts the soonest-to-expire post
+    is dropped, so the store stays bounded under busy broadcast feeds.
+    """
+
+    def __init__(self, max_posts: int = MAX_POSTS):
+        self.max_posts = max_posts
+        self._posts = {}          # (USER_ID, TIMESTAMP) → post dict
+        self._expires = {}        # (USER_ID, TIMESTAMP) → expiry time
+        self._by_message_id = {}  # MESSAGE_ID → key
+        self._by_author = {}      # USER_ID → {TIMESTAMP: key}
+        self._by_time = {}        # TIMESTAMP → {USER_ID: key}
+        self._heap = []           # (expiry time, key); stale entries skipped lazily
+        self._lock = threading.RLock()
+
+    def add(self, user_id: str, timestamp: int, post: dict, ttl: int = DEFAULT_TTL):
+        """Stores a post. Returns its key, or None if it has already expired."""
+        key = (user_id, timestamp)
+        expires_at = timestamp + ttl
+        now = time.time()
+        if expires_at <= now:
+            return None
+        with self._lock:
+            self.purge_expired(now)
+            if key in self._posts:
+                self._remove(key)
+            self._posts[key] = post
+            self._expires[key] = expires_at
+            message_id = post.get("MESSAGE_ID")
+            if message_id:
+                self._by_message_id[message_id] = key
+            self._by_author.setdefault(user_id, {})[timestamp] = key
+            self._by_time.setdefault(timestamp, {})[user_id] = key
+            heapq.heappush(self._heap, (expires_at, key))
+
+            while len(self._posts) > self.max_posts:
+                self._pop_soonest()
+        return key
+
+    def _remove(self, key):
+        user_id, timestamp = key
+        post = self._posts.pop(key)
+        del self._expires[key]
+        message_id = post.get("MESSAGE_ID")
+        if message_id and self._by_message_id.get(message_id) == key:
+            del self._by_message_id[message_id]
+        authored = self._by_author[user_id]
+        del authored[timestamp]
+        if not authored:
+            del self._by_author[user_id]
+        same_second = self._by_time[timestamp]
+        del same_second[user_id]
+        if not same_second:
+            del self._by_time[timestamp]
+        return post
+
+    def _pop_soonest(self):
+        while self._heap:
+            expires_at, key = heapq.heappop(self._heap)
+            if self._expires.get(key) == expires_at:
+                self._remove(key)
+                return
+
+    def purge_expired(self, now: float = None) -> int:
+        """Drops every post past its TTL. Returns how many were dropped."""
+        now = time.time() if now is None else now
+        purged = 0
+        with self._lock:
+            heap = self._heap
+            while heap and heap[0][0] <= now:
+                expires_at, key = heapq.heappop(heap)
+                if self._expires.get(key) == expires_at:
+                    self._remove(key)
+                    purged += 1
+        return purged
+
+    # ===== lookups =====
+    def get(self, key: tuple):
+        with self._lock:
+            self.purge_expired()
+            return self._posts.get(key)
+
+    def get_by_message_id(self, message_id: str):
+        with self._lock:
+            self.purge_expired()
+            key = self._by_message_id.get(message_id)
+            return None if key is None else self._posts[key]
+
+    def find(self, timestamp: int, author: str = None):
+        """
+        Post with this TIMESTAMP, from `author` if given (how a LIKE names
+        its post). Without an author, the most recently stored match.
+        Returns (key, post) or (None, None).
+        """
+        with self._lock:
+            self.purge_expired()
+            same_second = self._by_time.get(timestamp)
+            if not same_second:
+                return None, None
+            if author is not None:
+                key = same_second.get(author)
+            else:
+                key = next(reversed(same_second.values()))
+            return (key, self._posts[key]) if key else (None, None)
+
+    def by_author(self, user_id: str) -> list:
+        with self._lock:
+            self.purge_expired()
+            keys = self._by_author.get(user_id, {})
+            return [self._posts[keys[ts]] for ts in sorted(keys)]
+
+    def __len__(self):
+        return len(self._posts)
+
+    def __contains__(self, key):
+        return key in self._posts
+
+    def values(self) -> list:
+        with self._lock:
+            self.purge_expired()
+            return list(self._posts.values())
@@ -0,0 +1,152 @@
+import threading
+import time
+import event_log
+from config import (
+    RELIABLE_TYPES, RTO_INITIAL, RTO_MIN, RTO_MAX, MAX_RETRIES,
+)
+
+# ========== Reliable Delivery ==========
+# Unicast messages whose TYPE is in RELIABLE_TYPES and that carry a MESSAGE_ID
+# are kept in an outstanding table until the peer ACKs them. Entries are keyed
+# by (peer IP, MESSAGE_ID): one message sent to several group members is
+# tracked per member, and an ACK only clears the entry for the IP it came from
+# (not the port, since peers ACK from their send sockets). One sweeper
+# thread retransmits anything whose RTO expired, doubling that message's RTO
+# each time, and gives up after MAX_RETRIES. RTO per peer IP follows the usual
+# SRTT/RTTVAR estimator (RFC 6298), sampled only from messages that were
+# never retransmitted (Karn's rule).
+
+class RttEstimator:
+    __slots__ = ("srtt", "rttvar", "rto")
+
+    def __init__(self):
+        self.srtt = None
+        self.rttvar = None
+        self.rto = RTO_INITIAL
+
+    def sample(self, rtt: float):
+        if self.srtt is None:
+            self.srtt = rtt
+            self.rttvar = rtt / 2
+        else:
+            self.rttvar = 0.75 * self.rttvar + 0.25 * abs(self.srtt - rtt)
+            self.srtt = 0.875 * self.srtt + 0.125 * rtt
+        self.rto = min(RTO_MAX, max(RTO_MIN, self.srtt + 4 * self.rttvar))
+
+class Pending:
+    __slots__ = ("message_id", "data", "dest", "transmit", "on_complete",
+                 "sent_at", "deadline", "rto", "attempts")
+
+    def __init__(self, message_id, data, dest, transmit, on_complete, rto):
+        self.message_id = message_id
+        self.data = data
+        self.dest = dest
+        self.transmit = transmit
+        self.on_complete = on_complete
+        self.sent_at = time.monotonic()
+        self.rto = rto
+        self.deadline = self.sent_at + rto
+        self.attempts = 1
+
+_outstanding = {}  # (peer IP, MESSAGE_ID) → Pending
+_estimators = {}   # peer IP → RttEstimator
+_cond = threading.Condition()
+_sweeper = None
+
+stats = {
+    "SENT": 0,
+    "ACKED": 0,
+    "RETRANSMITS": 0,
+    "FAILED": 0,
+}
+
+def _estimator(ip: str) -> RttEstimator:
+    est = _estimators.get(ip)
+    if est is None:
+        if len(_estimators) > 4096:
+            _estimators.clear()
+        est = _estimators[ip] = RttEstimator()
+    return est
+
+def needs_tracking(msg) -> bool:
+    return msg.get("TYPE") in RELIABLE_TYPES and bool(msg.get("MESSAGE_ID"))
+
+def track(message_id: str, data: bytes, dest: tuple, transmit, on_complete=None):
+    """
+    Registers a message that was just sent. transmit(data, ip, port) is used
+    for retransmits; on_complete(message_id, delivered) runs once, on ACK or
+    after the final retry.
+    """
+    global _sweeper
+    with _cond:
+        rto = _estimator(dest[0]).rto
+        _outstanding[(dest[0], message_id)] = Pending(message_id, bytes(data), dest, transmit, on_complete, rto)
+        stats["SENT"] += 1
+        if _sweeper is None:
+            _sweeper = threading.Thread(target=_sweep_loop, daemon=True)
+            _sweeper.start()
+        _cond.notify()
+
+def acknowledge(message_id: str, addr: tuple) -> bool:
+    """
+    Marks message_id delivered to the peer at addr. Returns False if nothing
+    to that peer was outstanding under that ID.
+    """
+    with _cond:
+        pending = _outstanding.pop((addr[0], message_id), None)
+        if pending is None:
+            return False
+        if pending.attempts == 1:
+            _estimator(pending.dest[0]).sample(time.monotonic() - pending.sent_at)
+        stats["ACKED"] += 1
+    _complete(pending, True)
+    return True
+
+def is_outstanding(message_id: str, ip: str) -> bool:
+    return (ip, message_id) in _outstanding
+
+def rto_for(ip: str) -> float:
+    return _estimator(ip).rto
+
+def _complete(pending: Pending, delivered: bool):
+    if pending.on_complete is None:
+        return
+    try:
+        pending.on_complete(pending.message_id, delivered)
+    except Exception as e:
+        event_log.debug("CALLBACK_ERROR", id=pending.message_id, error=e)
+
+def _sweep_loop():
+    while True:
+        resend, failed = [], []
+        with _cond:
+            now = time.monotonic()
+            for key, pending in list(_outstanding.items()):
+                if pending.deadline <= now:
+                    if pending.attempts > MAX_RETRIES:
+                        del _outstanding[key]
+                        stats["FAILED"] += 1
+                        failed.append(pending)
+                        continue
+                    pending.attempts += 1
+                    pending.rto = min(RTO_MAX, pending.rto * 2)
+                    pending.deadline = now + pending.rto
+                    stats["RETRANSMITS"] += 1
+                    resend.append(pending)
+
+        for pending in resend:
+            try:
+                pending.transmit(pending.data, *pending.dest)
+            except OSError as e:
+                event_log.debug("RETRANSMIT_ERROR", id=pending.message_id, error=e)
+            event_log.debug("RETRANSMIT", id=pending.message_id, dst=pending.dest[0], attempt=pending.attempts)
+        for pending in failed:
+            event_log.debug("DELIVERY_FAILED", id=pending.message_id, dst=pending.dest[0])
+            _complete(pending, False)
+
+        with _cond:
+            if not _outstanding:
+                _cond.wait()
+            else:
+                next_deadline = min(p.deadline for p in _outstanding.values())
+                _cond.wait(max(0.0, next_deadline - time.monotonic()))
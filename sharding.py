@@ -0,0 +1,81 @@
+import multiprocessing
+import socket
+import threading
+from socket_handler import create_socket, ReceiveRing, receive_batch
+from message import parse_message
+from state import local_profile
+from file_transfer import framing
+import event_log
+
+# ========== Sharded Receive ==========
+# N worker processes bind (LOCAL_IP, PORT) with SO_REUSEPORT. The kernel hashes
+# each sender's address to one worker, so a peer always lands on the same
+# worker and its datagrams stay in order. Workers do the decode/parse work and
+# drop repeats from their own senders before the IPC hop (a partition of the
+# seen IDs), then hand parsed messages to the coordinator. Repeats of
+# reliable messages and FILE_CHUNKs are still forwarded: the sender is
+# retransmitting because our ACK was lost, and only the coordinator's
+# dispatch_message sends it again. The coordinator owns
+# peers, tokens and the authoritative seen_message_ids, since a retransmit can
+# come from a different source port and so land on another worker.
+#
+# Binary FILE_CHUNK frames (file_transfer/framing.py) are not parsed here;
+# they are passed through as bytes and the coordinator hands them to the
+# receiver.
+#
+# Broadcasts are never addressed to LOCAL_IP, so they keep arriving on the
+# coordinator's ordinary wildcard socket in receive_loop.
+
+def _worker_main(index: int, out_queue, drop):
+    sock = create_socket(bind_ip=local_profile["LOCAL_IP"], reuse_port=True)
+    ring = ReceiveRing()
+    while True:
+        try:
+            batch = receive_batch(sock, ring)
+        except Exception as e:
+            event_log.debug("RECV_ERROR", worker=index, error=e)
+            continue
+
+        for data, addr in batch:
+            try:
+                if framing.is_frame(data):
+                    out_queue.put((bytes(data), addr))
+                    continue
+                msg = parse_message(data)
+                if drop(msg, addr):
+                    continue
+                # Materialize: the ring buffer is reused and views can't be pickled
+                out_queue.put((dict(msg), addr))
+            except Exception as e:
+                event_log.debug("RECV_ERROR", worker=index, error=e, src=addr[0])
+
+def _coordinator_loop(in_queue, dispatch):
+    while True:
+        msg, addr = in_queue.get()
+        try:
+            dispatch(msg, addr)
+        except Exception as e:
+            event_log.debug("RECV_ERROR", error=e, src=addr[0])
+
+def start_workers(count: int, drop, dispatch) -> list:
+    """
+    Starts count receive workers plus the coordinator thread that feeds
+    dispatch(msg, addr); workers discard messages for which drop(msg, addr)
+    is true. Returns the worker processes (empty if the platform
+    has no SO_REUSEPORT, in which case receive_loop handles everything).
+    """
+    if not hasattr(socket, "SO_REUSEPORT"):
+        print("⚠️  SO_REUSEPORT unavailable, using a single receive thread.")
+        return []
+
+    # fork keeps drop (and the state it closes over) without pickling
+    ctx = multiprocessing.get_context("fork")
+    queue = ctx.Queue()
+    workers = []
+    for index in range(count):
+        proc = ctx.Process(target=_worker_main, args=(index, queue, drop), daemon=True)
+        proc.start()
+        workers.append(proc)
+
+    threading.Thread(target=_coordinator_loop, args=(queue, dispatch), daemon=True).start()
+    return workers
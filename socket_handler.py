@@ -1,32 +1,197 @@
 import socket
-from config import PORT, BUFFER_SIZE, BROADCAST_ADDRESS, settings
+import threading
+from collections import OrderedDict
+from message import parse_message
+import reliability
+from config import (
+    PORT, BUFFER_SIZE, BROADCAST_ADDRESS, settings,
+    HOT_PEER_THRESHOLD, MAX_CONNECTED_PEERS, RECV_BATCH,
+)
 
-def create_socket() -> socket.socket:
-    """Creates and binds a UDP socket to listen for messages."""
+# ========== Send Socket Pool ==========
+# Long-lived send sockets shared by every sender in the process, so a message
+# costs one sendto() instead of socket() + setsockopt() + sendto() + close().
+_pool_lock = threading.Lock()
+_broadcast_sock = None
+_unicast_sock = None
+_connected = OrderedDict()  # (ip, port) → connect()ed socket, in LRU order
+_send_counts = {}  # (ip, port) → datagrams sent before being promoted
+
+def create_socket(bind_ip: str = '', reuse_port: bool = False) -> socket.socket:
+    """
+    Creates and binds a UDP socket to listen for messages.
+    With reuse_port, several processes can bind the same (bind_ip, PORT) and
+    the kernel spreads incoming datagrams between them by sender address.
+    """
     sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
     sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
     sock.setsockopt(socket.SOL_SOCKET, socket.SO_BROADCAST, 1)
-    sock.bind(('', PORT))
+    if reuse_port:
+        sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEPORT, 1)
+    sock.bind((bind_ip, PORT))
     return sock
 
-def send_udp(message: str, ip: str, port: int = PORT):
+def _encode(message) -> bytes:
+    if isinstance(message, str):
+        return message.encode('utf-8')
+    return message
+
+def _get_broadcast_socket() -> socket.socket:
+    global _broadcast_sock
+    if _broadcast_sock is None:
+        with _pool_lock:
+            if _broadcast_sock is None:
+                sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+                sock.setsockopt(socket.SOL_SOCKET, socket.SO_BROADCAST, 1)
+                _broadcast_sock = sock
+    return _broadcast_sock
+
+def _get_unicast_socket(dest: tuple) -> socket.socket:
+    """
+    Returns the socket to use for a unicast destination. Destinations that
+    receive HOT_PEER_THRESHOLD datagrams get their own connect()ed socket so
+    the kernel skips the per-send route lookup; everything else shares one
+    unconnected socket.
+    """
+    with _pool_lock:
+        sock = _connected.get(dest)
+        if sock is not None:
+            _connected.move_to_end(dest)
+            return sock
+
+        count = _send_counts.get(dest, 0) + 1
+        if count >= HOT_PEER_THRESHOLD:
+            _send_counts.pop(dest, None)
+            sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+            sock.connect(dest)
+            _connected[dest] = sock
+            if len(_connected) > MAX_CONNECTED_PEERS:
+                # Not closed here: another sender may be mid-send() on it.
+                # The socket closes itself once its last user lets go of it.
+                _connected.popitem(last=False)
+            return sock
+        if len(_send_counts) >= MAX_CONNECTED_PEERS * 16:
+            _send_counts.clear()
+        _send_counts[dest] = count
+        return None
+
+def _get_fallback_socket() -> socket.socket:
+    global _unicast_sock
+    if _unicast_sock is None:
+        with _pool_lock:
+            if _unicast_sock is None:
+                _unicast_sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+    return _unicast_sock
+
+def _drop_connected(dest: tuple):
+    # Left for garbage collection, like an evicted socket (see above)
+    with _pool_lock:
+        _connected.pop(dest, None)
+
+_HAS_SENDMSG = hasattr(socket.socket, "sendmsg")  # not on Windows
+
+def _transmit(data, ip: str, port: int):
+    """Sends already-encoded bytes to (ip, port) through the send pool."""
+    dest = (ip, port)
+    sock = _get_unicast_socket(dest)
+    if sock is not None:
+        try:
+            sock.send(data)
+            return
+        except ConnectionRefusedError:
+            # A connected UDP socket reports the previous datagram's ICMP error
+            _drop_connected(dest)
+    _get_fallback_socket().sendto(data, dest)
+
+def send_udp(message, ip: str, port: int = PORT):
     """Sends a message via UDP to a specific IP."""
-    sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
-    sock.setsockopt(socket.SOL_SOCKET, socket.SO_BROADCAST, 1)
-    sock.sendto(message.encode('utf-8'), (BROADCAST_ADDRESS, port))
-    sock.close()
+    _get_broadcast_socket().sendto(_encode(message), (BROADCAST_ADDRESS, port))
+
+# ========== Batched Receive ==========
+_DONTWAIT = getattr(socket, "MSG_DONTWAIT", None)
+
+class ReceiveRing:
+    """Preallocated receive buffers, reused for every datagram."""
+
+    def __init__(self, slots: int = RECV_BATCH, size: int = BUFFER_SIZE):
+        self.buffers = [bytearray(size) for _ in range(slots)]
+        self.views = [memoryview(buf) for buf in self.buffers]
+
+def receive_batch(sock: socket.socket, ring: ReceiveRing) -> list:
+    """
+    Blocks for one datagram, then drains whatever else is already queued on
+    the socket (up to the ring size) without blocking. Returns a list of
+    (memoryview, addr); each view points into the ring and is only valid
+    until the next receive_batch call on the same ring.
+    """
+    views = ring.views
+    nbytes, addr = sock.recvfrom_into(views[0])
+    batch = [(views[0][:nbytes], addr)]
+    if _DONTWAIT is None:
+        return batch
 
-def receive_udp(sock: socket.socket) -> tuple[str, tuple[str, int]]:
-    """Receives a UDP message and returns decoded text and sender address."""
-    data, addr = sock.recvfrom(BUFFER_SIZE)
-    if settings["VERBOSE"]:
-        print (data.decode('utf-8'), addr)
-    return data.decode('utf-8'), addr
+    for view in views[1:]:
+        try:
+            nbytes, addr = sock.recvfrom_into(view, 0, _DONTWAIT)
+        except (BlockingIOError, InterruptedError):
+            break
+        batch.append((view[:nbytes], addr))
+    return batch
 
-def send_unicast(message: str, ip: str, port: int = None):
+def send_unicast(message, ip: str, port: int = None, on_complete=None):
     """
     Sends a unicast UDP message to the specified IP and port.
+    Messages in RELIABLE_TYPES that carry a MESSAGE_ID are retransmitted until
+    ACKed; on_complete(message_id, delivered) reports the outcome.
     """
     port = port or PORT
-    with socket.socket(socket.AF_INET, socket.SOCK_DGRAM) as sock:
-        sock.sendto(message.encode(), (ip, port))
\ No newline at end of file
+    data = _encode(message)
+
+    # Track before sending so a fast ACK can't arrive ahead of the entry
+    msg = parse_message(data)
+    tracked = reliability.needs_tracking(msg)
+    if tracked:
+        reliability.track(msg["MESSAGE_ID"], data, (ip, port), _transmit, on_complete)
+    _transmit(data, ip, port)
+    if not tracked and on_complete is not None:
+        on_complete(msg.get("MESSAGE_ID"), True)
+
+def send_datagram(data, ip: str, port: int = None):
+    """
+    Sends one pre-encoded datagram with no parsing and no reliability
+    tracking (bulk paths that do their own, like FILE_CHUNK streams).
+    data may also be a list of buffers, sent as one datagram without joining
+    them first (sendmsg scatter/gather where the platform has it).
+    """
+    if isinstance(data, list):
+        _transmit_parts(data, ip, port or PORT)
+    else:
+        _transmit(data, ip, port or PORT)
+
+def _transmit_parts(parts: list, ip: str, port: int):
+    if not _HAS_SENDMSG:
+        _transmit(b"".join(parts), ip, port)
+        return
+    dest = (ip, port)
+    sock = _get_unicast_socket(dest)
+    if sock is not None:
+        try:
+            sock.sendmsg(parts)
+            return
+        except ConnectionRefusedError:
+            _drop_connected(dest)
+    _get_fallback_socket().sendmsg(parts, (), 0, dest)
+
+def close_send_sockets():
+    """Closes every pooled send socket (called on shutdown)."""
+    global _broadcast_sock, _unicast_sock
+    with _pool_lock:
+        for sock in _connected.values():
+            sock.close()
+        _connected.clear()
+        _send_counts.clear()
+        for sock in (_broadcast_sock, _unicast_sock):
+            if sock is not None:
+                sock.close()
+        _broadcast_sock = None
+        _unicast_sock = None
@@ -3,6 +3,9 @@ from time import time
 import uuid
 import socket
 from utils import get_local_ip
+from dedup import Deduplicator
+from peer_directory import PeerDirectory
+from post_store import PostStore
 
 local_profile = {
     "USER_ID": "",
@@ -15,26 +18,21 @@ local_profile = {
 }
 
 # Known peers and profiles
-peers = {}  # USER_ID → {DISPLAY_NAME, STATUS, AVATAR, etc.
-posts = {}  # {POST_ID: message}
-liked_posts = set()  # Store TIMESTAMPs of liked posts
+peers = PeerDirectory()  # USER_ID → {DISPLAY_NAME, STATUS, AVATAR, etc.}, indexed by username and IP
+posts = PostStore()  # (USER_ID, TIMESTAMP) → post, indexed by MESSAGE_ID, author and time; TTL enforced
+liked_posts = set()  # (USER_ID, TIMESTAMP) keys of posts we liked
 likes_received = {}
 
-tokens = {}  # {token_string: {"EXPIRES_AT": 1234567890, "SCOPE": "DM,..."}}
-revoked_tokens = set()
+tokens = {}  # {token_string: {"EXPIRES_AT": 1234567890, "SCOPE": "DM,..."}}, received via TOKEN_REPLY
 dm_history = []
 
 follow_map = defaultdict(dict)  # USER_ID → set of followers
 group_map = defaultdict(dict)  # GROUP_ID → {group_name, members}
 
-seen_message_ids = set()
-file_transfers = {}  # FILEID → chunks
+seen_message_ids = Deduplicator()  # bounded, time-windowed
+file_transfers = {}  # FILEID → incoming transfer (open .part file, chunk bitmap)
 games = {}  # GAMEID → current board state
 
 def get_peer_address(user_id):
-    username = user_id.split("@")[0]
-    # Search for peer with matching username
-    for peer_id, info in peers.items():
-        if peer_id.startswith(username + "@"):
-            return info["ADDRESS"]
-    return None
\ No newline at end of file
+    # Peer with matching username (indexed, no scan)
+    return peers.address_of(user_id)
\ No newline at end of file
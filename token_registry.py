@@ -0,0 +1,204 @@
+import hashlib
+import threading
+import time
+from config import TOKEN_EXPIRATION_SECONDS, TOKEN_SWEEP_INTERVAL, MAX_TOKENS, MAX_REVOKED
+import async_engine
+
+# ========== Token Registry ==========
+# Tokens are "USER_ID|EXPIRES_AT|SCOPE". Each distinct token string is split
+# once into a TokenRecord and cached, so validating a token on the receive
+# path is one dict lookup plus a few comparisons. Records are indexed by
+# issuer (revoking everything a user issued is no longer a scan), and
+# revocations are kept as SHA-256 hashes with the token's expiry, so they can
+# be forgotten once the token would have been rejected as expired anyway.
+#
+# Tokens from the wire are a bounded cache (MAX_TOKENS, oldest evicted).
+# Tokens issued here (issue()) are kept apart and never evicted, so logout
+# can still find every one of them with tokens_by().
+
+def token_hash(token: str) -> str:
+    return hashlib.sha256(token.encode()).hexdigest()
+
+class TokenRecord:
+    __slots__ = ("token", "user", "expires", "scope", "hash", "revoked")
+
+    def __init__(self, token, user, expires, scope):
+        self.token = token
+        self.user = user
+        self.expires = expires
+        self.scope = scope
+        self.hash = token_hash(token)
+        self.revoked = False
+
+def parse_token(token: str):
+    """TokenRecord for a well-formed token string, else None."""
+    if not token or token.count('|') != 2:
+        return None
+    user, expires, scope = token.split('|')
+    try:
+        expires = int(expires)
+    except ValueError:
+        return None
+    return TokenRecord(token, user, expires, scope.strip().lower())
+
+class TokenRegistry:
+    def __init__(self, max_tokens: int = MAX_TOKENS, sweep_interval: float = TOKEN_SWEEP_INTERVAL,
+                 max_revoked: int = MAX_REVOKED):
+        self.max_tokens = max_tokens
+        self.max_revoked = max_revoked
+        self.sweep_interval = sweep_interval
+        self._records = {}    # token string → TokenRecord, cached from the wire
+        self._issued = {}     # token string → TokenRecord, issued here (never evicted)
+        self._by_issuer = {}  # USER_ID → {token string: TokenRecord}
+        self._by_hash = {}    # token hash → TokenRecord
+        self._revoked = {}    # token hash → expiry time
+        self._lock = threading.Lock()
+        self._sweeper = False
+
+    def lookup(self, token: str):
+        """Cached TokenRecord for token, parsing it on first sight. None if malformed."""
+        record = self._records.get(token) or self._issued.get(token)
+        if record is not None:
+            return record
+        record = parse_token(token)
+        if record is None:
+            return None
+        with self._lock:
+            cached = self._records.get(token) or self._issued.get(token)
+            if cached is not None:
+                return cached
+            if len(self._records) >= self.max_tokens:
+                self._forget(next(iter(self._records.values())))
+            self._records[token] = record
+            self._index(record)
+        self._start_sweeper()
+        return record
+
+    def issue(self, token: str):
+        """Registers a token issued here; it stays indexed until it expires or is revoked."""
+        record = parse_token(token)
+        if record is None:
+            return None
+        with self._lock:
+            cached = self._issued.get(token)
+            if cached is not None:
+                return cached
+            cached = self._records.pop(token, None)
+            if cached is not None:
+                record = cached
+            else:
+                self._index(record)
+            self._issued[token] = record
+        self._start_sweeper()
+        return record
+
+    def _index(self, record):
+        record.revoked = record.hash in self._revoked
+        self._by_hash[record.hash] = record
+        if not record.revoked:
+            self._by_issuer.setdefault(record.user, {})[record.token] = record
+
+    def validate(self, token: str, expected_scope: str) -> bool:
+        record = self._records.get(token) or self._issued.get(token) or self.lookup(token)
+        return (
+            record is not None
+            and not record.revoked
+            and record.expires >= time.time()
+            and record.scope == expected_scope.lower()
+        )
+
+    def is_revoked(self, token: str) -> bool:
+        record = self._records.get(token) or self._issued.get(token)
+        if record is not None:
+            return record.revoked
+        return token_hash(token) in self._revoked
+
+    def revoke(self, token: str) -> str:
+        """Marks token revoked; it is dropped from the issuer index. Returns its hash."""
+        record = self.lookup(token)
+        if record is None:
+            h = token_hash(token)
+            with self._lock:
+                self._revoked[h] = time.time() + TOKEN_EXPIRATION_SECONDS
+                self._cap_revoked()
+            self._start_sweeper()
+            return h
+        self.revoke_hashes([record.hash])
+        return record.hash
+
+    def revoke_hashes(self, hashes, issuer: str = None) -> list:
+        """
+        Revokes tokens by SHA-256 hash in one pass (REVOKE_BATCH). Hashes of
+        tokens never seen are remembered until the longest token lifetime
+        passes. With issuer (a peer's REVOKE_BATCH), only tokens known to be
+        issued by that USER_ID are revoked and other hashes are ignored.
+        Returns the token strings that were revoked.
+        """
+        unknown_expiry = time.time() + TOKEN_EXPIRATION_SECONDS
+        known = []
+        with self._lock:
+            for h in hashes:
+                record = self._by_hash.get(h)
+                if issuer is not None and (record is None or record.user != issuer):
+                    continue
+                if record is None:
+                    self._revoked[h] = unknown_expiry
+                    continue
+                record.revoked = True
+                self._revoked[h] = record.expires
+                known.append(record.token)
+                issued = self._by_issuer.get(record.user)
+                if issued is not None:
+                    issued.pop(record.token, None)
+                    if not issued:
+                        del self._by_issuer[record.user]
+            self._cap_revoked()
+        self._start_sweeper()
+        return known
+
+    def _cap_revoked(self):
+        while len(self._revoked) > self.max_revoked:
+            del self._revoked[next(iter(self._revoked))]
+
+    def tokens_by(self, user_id: str) -> list:
+        """Unrevoked, unexpired tokens issued by user_id."""
+        now = time.time()
+        return [t for t, r in list(self._by_issuer.get(user_id, {}).items()) if r.expires >= now]
+
+    def _forget(self, record):
+        self._records.pop(record.token, None)
+        self._issued.pop(record.token, None)
+        self._by_hash.pop(record.hash, None)
+        issued = self._by_issuer.get(record.user)
+        if issued is not None:
+            issued.pop(record.token, None)
+            if not issued:
+                del self._by_issuer[record.user]
+
+    # ===== expiry =====
+    def sweep(self, now: float = None) -> int:
+        """Drops expired tokens and revocations. Returns how many entries went."""
+        now = time.time() if now is None else now
+        with self._lock:
+            expired = [r for r in (*self._records.values(), *self._issued.values()) if r.expires < now]
+            for record in expired:
+                self._forget(record)
+            stale = [h for h, expires in self._revoked.items() if expires < now]
+            for h in stale:
+                del self._revoked[h]
+        return len(expired) + len(stale)
+
+    def _start_sweeper(self):
+        if not self._sweeper:
+            self._sweeper = True
+            async_engine.schedule_every(self.sweep_interval, self.sweep, f"token-sweeper-{id(self)}")
+
+    def stats(self) -> dict:
+        return {
+            "CACHED": len(self._records),
+            "ISSUED": len(self._issued),
+            "ISSUERS": len(self._by_issuer),
+            "REVOKED": len(self._revoked),
+        }
+
+registry = TokenRegistry()
@@ -1,34 +1,19 @@
 import time
-import hashlib
-
-revoked_tokens = set()
+from token_registry import registry, token_hash
 
 def is_token_expired(token: str) -> bool:
-    try:
-        _, expiry, _ = token.split("|")
-        return time.time() > int(expiry)
-    except Exception:
-        return True
+    record = registry.lookup(token)
+    return record is None or time.time() > record.expires
 
 def is_token_scope_valid(token: str, required_scope: str) -> bool:
-    try:
-        _, _, scope = token.split("|")
-        return scope == required_scope
-    except Exception:
-        return False
+    record = registry.lookup(token)
+    return record is not None and record.scope == required_scope.lower()
 
 def is_token_revoked(token: str) -> bool:
-    return token in revoked_tokens
+    return registry.is_revoked(token)
 
 def validate_token(token: str, expected_scope: str) -> bool:
-    return (
-        not is_token_expired(token) and
-        is_token_scope_valid(token, expected_scope) and
-        not is_token_revoked(token)
-    )
+    return registry.validate(token, expected_scope)
 
 def revoke_token(token: str):
-    revoked_tokens.add(token)
-
-def token_hash(token: str) -> str:
-    return hashlib.sha256(token.encode()).hexdigest()
+    registry.revoke(token)
@@ -1,7 +1,7 @@
 import random
 import time
 import socket
-import hashlib
+from token_registry import registry as token_registry
 
 RED = "\033[91m"
 GREEN = "\033[92m"
@@ -27,7 +27,9 @@ def generate_message_id() -> str:
     return '%016x' % random.getrandbits(64)
 
 def generate_token(user_id: str, scope: str, ttl: int = 3600, timestamp: int = int(time.time())) -> str:
-    return f"{user_id}|{str(timestamp + ttl)}|{scope}"
+    token = f"{user_id}|{str(timestamp + ttl)}|{scope}"
+    token_registry.issue(token)  # indexed under its issuer for revoke-on-exit
+    return token
 
 def generate_game_id() -> str:
     return f"g{random.randint(0, 255)}"
@@ -35,36 +37,43 @@ def generate_game_id() -> str:
 def parse_csv(s: str) -> list:
     return [x.strip() for x in s.split(',') if x.strip()]
 
-def hash_token(token):
-    return hashlib.sha256(token.encode()).hexdigest()
+def format_ranges(indices) -> str:
+    """Sorted ints as compact ranges: [0, 1, 2, 5, 7, 8] → "0-2,5,7-8"."""
+    parts = []
+    start = prev = None
+    for i in indices:
+        if start is None:
+            start = prev = i
+        elif i == prev + 1:
+            prev = i
+        else:
+            parts.append(f"{start}-{prev}" if prev != start else str(start))
+            start = prev = i
+    if start is not None:
+        parts.append(f"{start}-{prev}" if prev != start else str(start))
+    return ",".join(parts)
+
+def parse_ranges(s: str, limit: int = None) -> list:
+    """Inverse of format_ranges: "0-2,5" → [0, 1, 2, 5]."""
+    return list(iter_ranges(s, limit))
+
+def iter_ranges(s: str, limit: int = None):
+    """
+    parse_ranges as a generator, for range lists that may cover millions of
+    indices. With limit, every index must be in [0, limit): the whole list is
+    checked before anything is expanded, and a bad one raises ValueError.
+    """
+    bounds = []
+    for part in parse_csv(s or ""):
+        start, _, end = part.partition("-")
+        start = int(start)
+        end = int(end) if end else start
+        if start < 0 or end < start or (limit is not None and end >= limit):
+            raise ValueError(f"range out of bounds: {part}")
+        bounds.append((start, end))
+    for start, end in bounds:
+        yield from range(start, end + 1)
 
 def validate_token(token: str, expected_scope: str) -> bool:
-    if not token or '|' not in token:
-        return False
-
-    parts = token.split('|')
-    if len(parts) != 3:
-        return False
-
-    user_id, expiration, scope = parts
-
-    # try:
-    #     if '+' in expiration_expr:
-    #         timestamp_str, ttl_str = expiration_expr.split('+')
-    #         expiration = int(timestamp_str)
-    #         ttl = int(ttl_str)
-    #         expiration = expiration  # Already a timestamp, so nothing to add
-    #     else:
-    #         expiration = int(expiration_expr)
-    # except ValueError:
-    #     return False
-
-    current_time = int(time.time())
-    if current_time > int(expiration):
-        return False
-
-    if scope.strip().lower() != expected_scope.lower():
-        return False
-
-    return True
-
+    # Parsed once and cached; also rejects revoked tokens
+    return token_registry.validate(token, expected_scope)